@@ -0,0 +1,62 @@
+import os
+import sys
+
+
+# Function to locate resource files, works for both PyInstaller executable and dev environment
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and PyInstaller """
+    try:
+        # PyInstaller creates a temporary folder and stores the path in sys._MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        # The source folder, so the command line and watch mode work from any working directory
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    # Ensure backslashes for Windows paths
+    return os.path.join(base_path, relative_path).replace('\\', '/')
+
+
+# Ensure the history file is stored in a user-writable location (not inside the executable)
+def get_history_file_path():
+    """ Get the writable path for the history file in a fixed directory on your computer. """
+    # Define the fixed path where you want the history file to be saved
+    base_path = r"G:\Shared drives\Scribe Workspace\Scribe Master Folder\Scribe Label Maker"
+
+    # Ensure the directory exists (creates it if it doesn't exist)
+    os.makedirs(base_path, exist_ok=True)
+
+    # Construct the full path for the history file
+    history_file_path = os.path.join(base_path, "order_history.json")
+
+    return history_file_path
+
+
+# Function to locate the per-user cache directory, kept on the local disk rather than the shared drive
+def get_cache_dir(name):
+    """ Get (and create) a local, user-writable cache directory for ``name``. """
+    if sys.platform == "win32":
+        base_path = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        cache_dir = os.path.join(base_path, "Scribe Label Maker", "cache", name)
+    else:
+        base_path = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base_path, "scribe-label-maker", name)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+# Function to locate the per-user data directory for files that must not be lost like a cache
+def get_data_dir():
+    """ Get (and create) the local, user-writable data directory. """
+    if sys.platform == "win32":
+        base_path = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        data_dir = os.path.join(base_path, "Scribe Label Maker")
+    else:
+        base_path = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+        data_dir = os.path.join(base_path, "scribe-label-maker")
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def get_registry_path():
+    """ Get the order color registry database; LABEL_MAKER_REGISTRY can point it at a shared file. """
+    return os.environ.get("LABEL_MAKER_REGISTRY") or os.path.join(get_data_dir(), "order_registry.sqlite3")
@@ -0,0 +1,119 @@
+"""
+Benchmark for label_parser.parse_many.
+
+Parses generated chip file paths with the batch parser and with the previous
+per-file parsing code, checks both give the same results, and fails if the
+batch parser takes a second or more for 100k names.
+
+Usage:
+    python benchmarks/bench_label_parser.py [count]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from label_parser import STATUS_UNKNOWN_TYPE, parse_many  # noqa: E402
+
+BUDGET_SECONDS = 1.0
+
+
+def make_paths(count, seed=0):
+    """ Chip file paths in the shapes seen on the shared drive, including names without a type. """
+    rng = random.Random(seed)
+    first_names = ["Chris", "Dana", "Alex", "Sam", "Jordan", "Taylor", "Morgan"]
+    last_names = ["LaVigne", "Smith", "Nguyen", "Garcia", "O'Brien", "Kowalski"]
+    paths = []
+    for i in range(count):
+        order_name = f"{rng.choice(first_names)} {rng.choice(last_names)} T{rng.randint(1, 9)}"
+        start = rng.randint(1, 5000)
+        end = start + rng.randint(0, 500)
+        kind = rng.random()
+        if kind < 0.45:
+            name = f"{order_name} Envelopes-{start}-{end}.bin"
+        elif kind < 0.9:
+            name = f"{order_name} Letters-{start}-{end}.bin"
+        elif kind < 0.97:
+            name = f"{order_name} {start}-{end}.bin"
+        else:
+            name = f"{order_name}.bin"
+        paths.append(f"G:/Shared drives/Scribe Workspace/Chips/batch{i % 50}/{name}")
+    return paths
+
+
+LEGACY_RANGE = re.compile(r'(\d+)-(\d+)')
+
+
+def legacy_parse(file_name):
+    """ The per-file parsing that used to run inline in generate_labels_data, without the prompt. """
+    base_name = os.path.splitext(file_name)[0]
+    if "Envelopes" in base_name:
+        card_envelope = "Envelope"
+        parts = base_name.split("Envelopes")
+        order_name = parts[0].strip()
+        rest = parts[1].strip()
+    elif "Letters" in base_name:
+        card_envelope = "Card"
+        parts = base_name.split("Letters")
+        order_name = parts[0].strip()
+        rest = parts[1].strip()
+    else:
+        card_envelope = None
+        order_name = base_name.strip()
+        rest = ''
+    match = re.search(r'(\d+)-(\d+)', rest if rest else base_name)
+    if match:
+        num_records = int(match.group(2)) - int(match.group(1)) + 1
+        if not rest:
+            order_name = order_name[:match.start()].strip()
+    else:
+        num_records = None
+    return order_name, card_envelope, num_records
+
+
+def legacy_parse_many(paths):
+    return [legacy_parse(os.path.basename(path)) for path in paths]
+
+
+def best_of(function, argument, repeat=5):
+    """ Best time of ``repeat`` runs; results are dropped between runs so the garbage collector
+    does not scan the records of earlier runs while timing the next one. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 100_000
+    paths = make_paths(count)
+
+    batch_seconds = best_of(parse_many, paths)
+    legacy_seconds = best_of(legacy_parse_many, paths)
+
+    records = parse_many(paths)
+    legacy = legacy_parse_many(paths)
+    for record, expected in zip(records, legacy):
+        assert (record.order_name, record.card_envelope, record.num_records) == expected, (record, expected)
+
+    unknown = sum(1 for record in records if record.status == STATUS_UNKNOWN_TYPE)
+    print(f"{count} file names, {unknown} without a type keyword")
+    print(f"parse_many:      {batch_seconds:.3f} s ({count / batch_seconds:,.0f} names/s)")
+    print(f"legacy per-file: {legacy_seconds:.3f} s ({count / legacy_seconds:,.0f} names/s)")
+    print(f"parse_many takes {batch_seconds / legacy_seconds:.0%} of the legacy time")
+
+    if count >= 100_000 and batch_seconds * count / 100_000 >= BUDGET_SECONDS:
+        print(f"FAIL: over the {BUDGET_SECONDS:.1f} s budget for 100k names")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Automatic order colors.
+
+Colors come from a fixed palette of saturated colors that keep at least a
+3:1 WCAG contrast ratio against the white label stock, so label text stays
+readable. Each new order gets the palette color farthest (in CIELAB) from
+every color already in use, which spreads a batch across the palette and keeps
+it away from the colors of recent orders. The result only depends on the
+inputs, so the same import always gets the same colors.
+"""
+import colorsys
+
+# WCAG 2 minimum contrast for large text and graphics; label text is 50-60 px bold at 300 DPI
+MIN_CONTRAST_ON_WHITE = 3.0
+
+# Saturation and value steps tried for every hue of the palette
+_SHADES = ((1.0, 0.75), (1.0, 0.55), (0.6, 0.6), (1.0, 0.4), (0.45, 0.45))
+_HUE_STEPS = 24
+
+
+def hex_to_rgb(hex_color):
+    """ Parse "rrggbb" or "#rrggbb" into an (r, g, b) tuple of 0-255 ints. """
+    hex_color = hex_color.lstrip("#")
+    if len(hex_color) != 6:
+        raise ValueError(f"Expected a 6 digit hex color, got '{hex_color}'")
+    return int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+
+
+def _linear(channel):
+    channel /= 255
+    return channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+
+
+def relative_luminance(rgb):
+    r, g, b = (_linear(channel) for channel in rgb)
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def contrast_ratio(rgb_a, rgb_b=(255, 255, 255)):
+    """ WCAG contrast ratio between two colors, from 1 (same) to 21 (black on white). """
+    lighter, darker = sorted((relative_luminance(rgb_a), relative_luminance(rgb_b)), reverse=True)
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def rgb_to_lab(rgb):
+    """ sRGB to CIELAB (D65), where Euclidean distance approximates perceived difference. """
+    r, g, b = (_linear(channel) for channel in rgb)
+    x = (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047
+    y = 0.2126 * r + 0.7152 * g + 0.0722 * b
+    z = (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883
+
+    def f(t):
+        return t ** (1 / 3) if t > 0.008856 else 7.787 * t + 16 / 116
+
+    fx, fy, fz = f(x), f(y), f(z)
+    return 116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)
+
+
+def _distance(lab_a, lab_b):
+    return sum((a - b) ** 2 for a, b in zip(lab_a, lab_b)) ** 0.5
+
+
+def build_palette(min_contrast=MIN_CONTRAST_ON_WHITE):
+    """ Return the candidate colors as "rrggbb" strings, in a fixed order. """
+    palette = []
+    for saturation, value in _SHADES:
+        for step in range(_HUE_STEPS):
+            rgb = tuple(round(channel * 255) for channel in colorsys.hsv_to_rgb(step / _HUE_STEPS, saturation, value))
+            color = "%02x%02x%02x" % rgb
+            if contrast_ratio(rgb) >= min_contrast and color not in palette:
+                palette.append(color)
+    return palette
+
+
+PALETTE = build_palette()
+_PALETTE_LAB = [rgb_to_lab(hex_to_rgb(color)) for color in PALETTE]
+
+
+def pick_distinct_colors(count, used=()):
+    """
+    Pick ``count`` palette colors, each as far as possible from the used colors and the ones picked before it.
+
+    :param count: Number of colors to pick, one per new order.
+    :param used: Colors ("rrggbb") already assigned, e.g. this session's and recent history's orders;
+                 values that are not hex colors are ignored.
+    :return: List of "rrggbb" strings. Once every palette color is in use, picking starts over.
+    """
+    nearest = [float("inf")] * len(PALETTE)
+
+    def mark_used(lab):
+        for index, candidate in enumerate(_PALETTE_LAB):
+            distance = _distance(lab, candidate)
+            if distance < nearest[index]:
+                nearest[index] = distance
+
+    for color in used:
+        try:
+            mark_used(rgb_to_lab(hex_to_rgb(color)))
+        except (TypeError, ValueError):
+            continue
+
+    picked = []
+    for _ in range(count):
+        # The first best candidate wins ties, which keeps the choice deterministic
+        best = max(range(len(PALETTE)), key=nearest.__getitem__)
+        if nearest[best] == 0:
+            nearest = [float("inf")] * len(PALETTE)
+            best = 0
+        picked.append(PALETTE[best])
+        mark_used(_PALETTE_LAB[best])
+    return picked
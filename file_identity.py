@@ -0,0 +1,168 @@
+"""
+Content identity of chip files.
+
+Files are hashed through read-only memory maps in fixed-size chunks on a thread
+pool (hashlib releases the GIL while hashing, so reads from the shared drive
+overlap). Digests are cached by (path, size, mtime), so a file is only read
+again after it changed. ContentIndex uses the digests to spot copies of the
+same chip saved under different names.
+"""
+import concurrent.futures
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 4 * 1024 * 1024
+HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """ Return the SHA-256 hex digest of a file, read through a memory map in chunks. """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, chunk_size):
+                        digest.update(view[offset:offset + chunk_size])
+                finally:
+                    view.release()
+    return digest.hexdigest()
+
+
+class FileDigestCache:
+    """
+    Digests of files keyed by path and validated by size and mtime.
+
+    :param max_entries: Number of files remembered; the least recently used are dropped first.
+    :param workers: Threads used to hash files that are not cached.
+    """
+
+    def __init__(self, max_entries=20000, workers=HASH_WORKERS):
+        self.max_entries = max_entries
+        self.workers = workers
+        self.hashed = 0
+        self.reused = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, path, signature):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.reused += 1
+                return entry[1]
+        return None
+
+    def _store(self, path, signature, digest):
+        with self._lock:
+            self.hashed += 1
+            self._entries[path] = (signature, digest)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def digest_many(self, paths, stats=None):
+        """
+        Return {path: digest} for the given files, hashing only new or changed ones in parallel.
+
+        :param stats: Optional {path: os.stat result} already collected for these files.
+
+        Files that cannot be read map to None and are logged.
+        """
+        stats = stats or {}
+        digests = {}
+        to_hash = []
+        for path in dict.fromkeys(paths):
+            stat = stats.get(path)
+            if stat is None:
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    logging.error(f"Failed to read '{path}' for duplicate check: {str(e)}")
+                    digests[path] = None
+                    continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            digest = self._cached(path, signature)
+            if digest is None:
+                to_hash.append((path, signature))
+            else:
+                digests[path] = digest
+
+        def hash_one(item):
+            path, signature = item
+            digest = hash_file(path)
+            self._store(path, signature, digest)
+            return digest
+
+        if len(to_hash) <= 1 or self.workers <= 1:
+            results = [self._try(hash_one, item) for item in to_hash]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(to_hash))) as executor:
+                results = list(executor.map(lambda item: self._try(hash_one, item), to_hash))
+        for (path, _signature), digest in zip(to_hash, results):
+            digests[path] = digest
+        return digests
+
+    @staticmethod
+    def _try(function, item):
+        try:
+            return function(item)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read '{item[0]}' for duplicate check: {str(e)}")
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {"hashed": self.hashed, "reused": self.reused, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hashed = self.reused = 0
+
+
+# Shared by every import in this process, so re-selected files are not read again
+default_cache = FileDigestCache()
+
+
+class ContentIndex:
+    """
+    Content digests of the chip files a session imported.
+
+    :param cache: FileDigestCache used to hash files.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or default_cache
+        self.first_paths = {}  # digest -> path of the first file seen with that content
+        self.duplicates = []  # (path, first_path) of files skipped as copies
+        self.reprints = []  # (path, order_name, card_envelope) of new content skipped for an already imported label
+
+    def digest_many(self, paths, stats=None):
+        return self.cache.digest_many(paths, stats)
+
+    def original_of(self, path, digest):
+        """ Return the earlier file with the same content, or None if ``path`` is the first (or unreadable). """
+        if digest is None:
+            return None
+        first_path = self.first_paths.get(digest)
+        if first_path is None or os.path.normcase(os.path.abspath(first_path)) == os.path.normcase(os.path.abspath(path)):
+            return None
+        return first_path
+
+    def add(self, path, digest):
+        if digest is not None:
+            self.first_paths.setdefault(digest, path)
+
+    def clear(self):
+        """ Forget the session's files; digests stay cached for the next session. """
+        self.first_paths.clear()
+        self.duplicates.clear()
+        self.reprints.clear()
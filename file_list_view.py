@@ -0,0 +1,139 @@
+"""
+Virtualized list of selected chip file names.
+
+The list is drawn on a canvas with one text item per visible row. Scrolling
+only rewrites the text and position of those few items, and appending files
+extends a Python list and schedules one redraw, so showing thousands of files
+costs the same as showing ten.
+"""
+import sys
+import tkinter as tk
+import tkinter.font as tkfont
+
+import customtkinter as ctk
+
+
+class VirtualFileList(ctk.CTkFrame):
+    """
+    Titled, scrollable list that only creates canvas items for the visible rows.
+
+    :param master: Parent widget.
+    :param title: Heading shown above the list, followed by the file count.
+    :param visible_rows: Rows shown before the list starts scrolling.
+    :param bg: Background color of the list; should match the parent.
+    """
+
+    def __init__(self, master, title, visible_rows=10, bg="#3A3A3A", text_color="white",
+                 font=("Helvetica", 12), **kwargs):
+        super().__init__(master, fg_color=bg, **kwargs)
+        self.title = title
+        self.visible_rows = visible_rows
+        self.text_color = text_color
+        self._items = []
+        self._offset = 0  # Pixels scrolled from the top of the list
+        self._rows = []  # Pool of canvas text items, reused for whichever rows are visible
+        self._redraw_pending = False
+
+        self._font = tkfont.Font(family=font[0], size=font[1])
+        self._row_height = self._font.metrics("linespace") + 2
+
+        self._title_label = ctk.CTkLabel(self, text=f"{title}:", font=font, text_color=text_color, anchor="w")
+        self._title_label.pack(fill="x")
+
+        body = ctk.CTkFrame(self, fg_color=bg)
+        body.pack(fill="x")
+        self._canvas = tk.Canvas(body, bg=bg, highlightthickness=0, height=1)
+        self._scrollbar = ctk.CTkScrollbar(body, orientation="vertical", command=self._yview)
+        self._canvas.pack(side="left", fill="x", expand=True)
+
+        self._canvas.bind("<Configure>", lambda event: self._redraw())
+        self._canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self._canvas.bind("<Button-4>", self._on_mousewheel)
+        self._canvas.bind("<Button-5>", self._on_mousewheel)
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, names):
+        """ Add file names to the end of the list; the view is redrawn once when Tk is idle. """
+        self._items.extend(names)
+        self._schedule_redraw()
+
+    def clear(self):
+        self._items.clear()
+        self._offset = 0
+        self._schedule_redraw()
+
+    def _schedule_redraw(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _view_height(self):
+        return min(len(self._items), self.visible_rows) * self._row_height
+
+    def _max_offset(self):
+        return max(len(self._items) * self._row_height - self._view_height(), 0)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        count = len(self._items)
+        self._title_label.configure(text=f"{self.title}: ({count})" if count else f"{self.title}:")
+
+        view_height = self._view_height()
+        if int(self._canvas.cget("height")) != max(view_height, 1):
+            self._canvas.configure(height=max(view_height, 1))
+
+        # Only show the scrollbar when the list is longer than the view
+        if count > self.visible_rows:
+            if not self._scrollbar.winfo_manager():
+                self._scrollbar.pack(side="right", fill="y")
+        elif self._scrollbar.winfo_manager():
+            self._scrollbar.pack_forget()
+
+        self._offset = min(max(self._offset, 0), self._max_offset())
+        first_row, shift = divmod(self._offset, self._row_height)
+
+        # One extra row covers the partly visible one at the bottom while scrolling
+        needed = min(self.visible_rows + 1, count)
+        while len(self._rows) < needed:
+            self._rows.append(self._canvas.create_text(2, 0, anchor="nw", font=self._font, fill=self.text_color))
+
+        for index, item in enumerate(self._rows):
+            row = first_row + index
+            if index < needed and row < count:
+                self._canvas.itemconfigure(item, text=self._items[row], state="normal")
+                self._canvas.coords(item, 2, index * self._row_height - shift)
+            else:
+                self._canvas.itemconfigure(item, state="hidden")
+
+        total_height = count * self._row_height
+        if total_height:
+            self._scrollbar.set(self._offset / total_height, (self._offset + view_height) / total_height)
+
+    def _scroll_to(self, offset):
+        self._offset = int(offset)
+        self._redraw()
+
+    def _yview(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self._items) * self._row_height)
+        elif args[0] == "scroll":
+            step = self._row_height if args[2] == "units" else self._view_height()
+            self._scroll_to(self._offset + int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        if len(self._items) <= self.visible_rows:
+            # Nothing to scroll here, let the page scroll instead
+            return None
+        if event.num == 4:
+            rows = -3
+        elif event.num == 5:
+            rows = 3
+        elif sys.platform == "darwin":
+            rows = -event.delta
+        else:
+            rows = -3 * event.delta // 120
+        self._scroll_to(self._offset + rows * self._row_height)
+        # Keep the page behind the list from scrolling too
+        return "break"
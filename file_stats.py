@@ -0,0 +1,69 @@
+"""
+Short-lived, thread-safe cache of file metadata.
+
+A stat on the Google Drive-backed G: drive can take tens of milliseconds, so
+selections are validated on a thread pool, and the results are kept for a few
+seconds so the import that follows (validation, content hashing) does not
+stat the same files again.
+"""
+import concurrent.futures
+import os
+import stat as stat_module
+import threading
+import time
+
+STAT_WORKERS = 16
+
+
+def is_regular_file(stat_result):
+    return stat_result is not None and stat_module.S_ISREG(stat_result.st_mode)
+
+
+class StatCache:
+    """
+    os.stat results cached for ``ttl`` seconds.
+
+    :param ttl: Seconds a result is reused; keep it short, files on the shared drive change.
+    :param workers: Threads used by stat_many.
+    """
+
+    def __init__(self, ttl=5.0, workers=STAT_WORKERS):
+        self.ttl = ttl
+        self.workers = workers
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + ttl
+
+    def stat(self, path):
+        """ Return the os.stat result for ``path``, or None if it does not exist or cannot be read. """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry[0] < self.ttl:
+                return entry[1]
+        try:
+            result = os.stat(path)
+        except OSError:
+            result = None
+        now = time.monotonic()
+        with self._lock:
+            self._entries[path] = (now, result)
+            # Drop expired results once per ttl, so a long watch-folder session does not keep every path it saw
+            if now >= self._next_prune:
+                self._entries = {cached: entry for cached, entry in self._entries.items() if now - entry[0] < self.ttl}
+                self._next_prune = now + self.ttl
+        return result
+
+    def stat_many(self, paths):
+        """ Yield (path, stat result or None) in the order of ``paths``, stat'ing on a thread pool. """
+        paths = list(paths)
+        if len(paths) <= 1 or self.workers <= 1:
+            for path in paths:
+                yield path, self.stat(path)
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(paths))) as executor:
+            yield from zip(paths, executor.map(self.stat, paths))
+
+
+# Shared by validation, content hashing and the GUI's background checks
+default_cache = StatCache()
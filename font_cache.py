@@ -0,0 +1,86 @@
+"""
+Process-wide font registry and rendered-text cache for label rendering.
+
+Fonts are loaded once per (path, size) per process. Text is rasterized once
+into an 8-bit coverage mask per (text, font); drawing it again is a paste of
+the label color through the cached mask, which gives the same pixels as
+ImageDraw.text.
+"""
+import functools
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+from pdf_writer import TrueTypeFont
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(path, size):
+    """ Return the PIL font for ``path`` at ``size`` pixels, loading it only once. """
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=None)
+def get_truetype_font(path):
+    """ Return the parsed TrueType font used by the vector backend, loading it only once. """
+    return TrueTypeFont(path)
+
+
+class TextBitmapCache:
+    """
+    Bounded LRU cache of rasterized text masks.
+
+    :param max_entries: Number of masks kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text, font):
+        """
+        Return (mask, (dx, dy)) for ``text``: the mask's top-left corner goes at
+        (x + dx, y + dy) to match ImageDraw.text((x, y), text, font=font).
+        """
+        key = (text, font.path, font.size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        left, top, right, bottom = font.getbbox(text)
+        mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        entry = (mask, (left, top))
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+# Process-wide cache shared by every page rendered in this process
+text_cache = TextBitmapCache()
+
+
+def draw_text(page, xy, text, font, color):
+    """ Draw ``text`` onto ``page`` like ImageDraw.text, reusing the cached mask. """
+    mask, (dx, dy) = text_cache.get(text, font)
+    page.paste(color, (xy[0] + dx, xy[1] + dy), mask)
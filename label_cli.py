@@ -0,0 +1,236 @@
+"""
+Command-line entry point for generating label PDFs without the GUI.
+
+Examples:
+    python label_cli.py "G:/Chips/*.bin" -o batch.pdf --color "Chris LaVigne T1=1f77b4"
+    python label_cli.py chips/*Envelopes*.bin chips/*Letters*.bin -o batch.pdf --colors colors.json --qr qr.json
+    python label_cli.py --watch "G:/Chips/Incoming" -o batch.pdf --colors colors.json --quiet-seconds 15
+
+Files are parsed exactly like the "Select ... Chip Files" buttons and rendered
+with the same generate_labels_pdf as "Create PDF". Nothing from tkinter or
+customtkinter is imported, so it runs on machines without a display.
+
+With --watch, chip files dropped into the folder are parsed as soon as their
+copy finishes, and once no new file arrived for --quiet-seconds the labels
+collected so far are written to <output name>-<date>-<time>.pdf.
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import file_stats
+import page_cache
+import qr_cache
+from app_paths import get_cache_dir
+from label_data import LabelIndex, add_labels_from_files, apply_order_colors
+from label_render import BACKENDS, DEFAULT_RESOLUTION, RESOLUTION_PROFILES, generate_labels_pdf
+
+
+def expand_paths(patterns):
+    """ Expand glob patterns (the Windows shell does not) and keep plain paths as given, in order. """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logging.warning(f"No files match '{pattern}'")
+        for path in matches:
+            if os.path.isdir(path):
+                continue
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def load_mapping(json_files, pairs, option):
+    """
+    Merge ORDER=VALUE mappings from JSON files and repeated command-line pairs.
+
+    :param json_files: Paths of JSON files holding an object of order_name -> value.
+    :param pairs: "ORDER=VALUE" strings; they override values from the JSON files.
+    :param option: Option name used in error messages.
+    """
+    mapping = {}
+    for path in json_files or []:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if not isinstance(data, dict):
+            raise ValueError(f"{option} file '{path}' must contain a JSON object of order name to value")
+        mapping.update({str(key): str(value) for key, value in data.items()})
+    for pair in pairs or []:
+        order_name, separator, value = pair.rpartition("=")
+        if not separator or not order_name.strip():
+            raise ValueError(f"{option} expects ORDER=VALUE, got '{pair}'")
+        mapping[order_name.strip()] = value.strip()
+    return mapping
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a label PDF from chip files without the GUI.")
+    parser.add_argument("paths", nargs="*", help="Chip files or glob patterns (quote patterns to pass them through).")
+    parser.add_argument("-o", "--output", required=True, help="Path of the PDF to write.")
+    parser.add_argument("--colors", action="append", metavar="JSON",
+                        help="JSON file mapping order name to hex color; may be repeated.")
+    parser.add_argument("--color", action="append", metavar="ORDER=HEX", help="Color for one order; may be repeated.")
+    parser.add_argument("--qr", action="append", metavar="JSON",
+                        help="JSON file mapping order name to QR code URL; may be repeated.")
+    parser.add_argument("--qr-url", action="append", metavar="ORDER=URL", help="QR code URL for one order; may be repeated.")
+    parser.add_argument("--default-type", choices=("Envelopes", "Letters"),
+                        help="Type for files whose name has neither 'Envelopes' nor 'Letters' (skipped otherwise).")
+    parser.add_argument("--backend", choices=BACKENDS, default="raster", help="PDF rendering backend (default: raster).")
+    parser.add_argument("--resolution", choices=tuple(RESOLUTION_PROFILES), default=DEFAULT_RESOLUTION,
+                        help="Raster resolution: draft (150 DPI), standard (300 DPI) or high (600 DPI); "
+                             "default: standard.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to render pages (default: number of CPUs).")
+    parser.add_argument("--no-qr-cache", action="store_true", help="Do not use the on-disk QR code cache.")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="Render every page instead of reusing unchanged pages from the on-disk page cache.")
+    parser.add_argument("--append", action="store_true",
+                        help="If the output PDF exists, add the labels to it (filling its last page first) "
+                             "instead of replacing it.")
+    parser.add_argument("--dedupe-content", action="store_true",
+                        help="Skip files whose content is identical to another selected file.")
+    parser.add_argument("--watch", metavar="FOLDER",
+                        help="Keep running and create a PDF for each batch of chip files dropped into FOLDER.")
+    parser.add_argument("--quiet-seconds", type=float, default=10.0,
+                        help="With --watch, seconds without new files before a batch is rendered (default: 10).")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll the folder instead of using file system events.")
+    return parser
+
+
+def render_labels(labels_data, order_colors, qr_codes, output, args):
+    """ Apply colors and write the labels to ``output``; returns True on success. """
+    missing_colors = sorted({label['order_name'] for label in labels_data} - set(order_colors))
+    for order_name in missing_colors:
+        logging.warning(f"No color given for '{order_name}', using black")
+
+    apply_order_colors(labels_data, order_colors)
+    try:
+        output_dir = os.path.dirname(output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        generate_labels_pdf(labels_data, qr_codes, output_pdf=output, backend=args.backend,
+                            streaming=True, workers=args.workers, append=args.append, resolution=args.resolution)
+    except Exception as e:
+        logging.error(f"Failed to create the PDF file: {str(e)}")
+        return False
+    return True
+
+
+def new_content_index(args):
+    """ Content index for --dedupe-content, or None when the check is off. """
+    if not args.dedupe_content:
+        return None
+    from file_identity import ContentIndex
+    return ContentIndex()
+
+
+def batch_output_path(output):
+    """ Path for one watch-mode batch: the output name with the current date and time appended. """
+    stem, extension = os.path.splitext(output)
+    return f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}{extension or '.pdf'}"
+
+
+def watch(args, order_colors, qr_codes, ask_type):
+    """ Parse chip files as they arrive in args.watch and render each quiet batch; runs until Ctrl+C. """
+    from watch_folder import FolderWatcher
+
+    # Both callbacks run on the watcher's thread, one at a time
+    labels_data = []
+    index = LabelIndex()
+    content_index = new_content_index(args)
+
+    def on_files(paths):
+        added = add_labels_from_files(paths, labels_data, ask_type=ask_type, index=index,
+                                      content_index=content_index)
+        print(f"Queued {len(added)} labels from {len(paths)} new files")
+
+    def on_quiet():
+        if not labels_data:
+            return
+        output = batch_output_path(args.output)
+        if not render_labels(labels_data, order_colors, qr_codes, output, args):
+            # The watcher has already handed these files over, so keep their labels for the next try
+            logging.warning(f"Keeping {len(labels_data)} labels for the next attempt")
+            return False
+        print(f"{len(labels_data)} labels written to {output}")
+        labels_data.clear()
+        index.clear()
+        if content_index is not None:
+            content_index.clear()
+
+    watcher = FolderWatcher(args.watch, on_files, on_quiet, quiet_seconds=args.quiet_seconds,
+                            use_polling=args.poll)
+    try:
+        watcher.start()
+    except OSError as e:
+        logging.error(str(e))
+        return 2
+    print(f"Watching {watcher.folder} ({watcher.mode}); press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    # Files that arrived but were not rendered yet
+    if labels_data and on_quiet() is False:
+        return 1
+    return 0
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    args = build_parser().parse_args(argv)
+
+    try:
+        order_colors = {name: color.lstrip("#") for name, color in load_mapping(args.colors, args.color, "--colors").items()}
+        qr_codes = load_mapping(args.qr, args.qr_url, "--qr")
+    except (OSError, ValueError) as e:
+        logging.error(str(e))
+        return 2
+
+    if not args.no_qr_cache:
+        qr_cache.configure_default_cache(cache_dir=get_cache_dir("qr_codes"))
+    if not args.no_page_cache:
+        page_cache.configure_default_cache(cache_dir=get_cache_dir("pages"))
+
+    def ask_type(file_name):
+        if args.default_type is None:
+            logging.warning(f"Skipping '{file_name}': name contains neither 'Envelopes' nor 'Letters'")
+        return args.default_type
+
+    if args.watch:
+        return watch(args, order_colors, qr_codes, ask_type)
+    if not args.paths:
+        logging.error("No chip files given (pass paths or --watch FOLDER).")
+        return 2
+
+    labels_data = []
+    files = expand_paths(args.paths)
+    add_labels_from_files(files, labels_data, ask_type=ask_type, content_index=new_content_index(args),
+                          stat_cache=file_stats.default_cache)
+    if not labels_data:
+        logging.error("No valid chip files found.")
+        return 1
+
+    if not render_labels(labels_data, order_colors, qr_codes, args.output, args):
+        return 1
+
+    print(f"{len(labels_data)} labels from {len(files)} files written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Required so PDF render worker processes start correctly from a frozen executable
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Builds label records from chip file names. Shared by the GUI and the command
+line, so it must not import any GUI toolkit.
+"""
+import logging
+import os
+
+from file_stats import is_regular_file
+from label_parser import STATUS_UNKNOWN_TYPE, default_parser
+
+
+def resolve_record(record, ask_type=None, parser=default_parser):
+    """ Ask for the type of a record whose name has no type keyword; None if the file is skipped. """
+    if record.status != STATUS_UNKNOWN_TYPE:
+        return record
+    selected_type = ask_type(record.file_name) if ask_type else None
+    if selected_type is None:
+        # Cancelled, closed or invalid selection
+        return None
+    return parser.resolve_type(record, selected_type)
+
+
+def resolve_records(records, ask_type=None, parser=default_parser):
+    """
+    Resolve the records of one import in a single pass over the names without a type keyword.
+
+    :param records: ChipRecords from ChipFileParser.parse_many.
+    :param ask_type: Called with the file name when it contains none of the parser's type keywords
+                     (e.g. "Envelopes" or "Letters"); returns a type name such as "Envelopes",
+                     or None to skip the file.
+    :param parser: ChipFileParser holding the naming rules.
+    :return: The records in the same order; asked-for types filled in, None for skipped files.
+    """
+    resolved = list(records)
+    unresolved = [position for position, record in enumerate(records) if record.status == STATUS_UNKNOWN_TYPE]
+    for position in unresolved:
+        resolved[position] = resolve_record(records[position], ask_type, parser)
+    return resolved
+
+
+def number_batch(labels):
+    """ Assign "i of N" batch numbers to the labels of one (order_name, card_envelope) group. """
+    total_batches = len(labels)
+    for i, label in enumerate(labels):
+        label['batch_chip'] = f"{i + 1} of {total_batches}"
+
+
+class LabelIndex:
+    """
+    Labels of a session grouped by (order_name, card_envelope), kept alongside labels_data.
+
+    Lets an import check for duplicates and renumber batches without scanning
+    every label the session already holds.
+
+    :param labels_data: Existing labels to index, in order.
+    """
+
+    def __init__(self, labels_data=()):
+        self.groups = {}
+        for label in labels_data:
+            self.add(label)
+
+    def __contains__(self, key):
+        return key in self.groups
+
+    def __len__(self):
+        return len(self.groups)
+
+    def add(self, label):
+        """ Index a label appended to labels_data and return its group key. """
+        key = (label['order_name'], label['card_envelope'])
+        self.groups.setdefault(key, []).append(label)
+        return key
+
+    def renumber(self, keys):
+        """ Rewrite the "i of N" batch numbers of the given groups only. """
+        for key in keys:
+            number_batch(self.groups[key])
+
+    def clear(self):
+        self.groups.clear()
+
+
+def add_labels_from_files(files, labels_data, ask_type=None, index=None, parser=default_parser, content_index=None,
+                          stat_cache=None, new_keys=None, digests=None):
+    """
+    Parse chip files and append a label for each new (order_name, card_envelope) pair.
+
+    Several files of the same pair in one import become its "i of N" batches;
+    pairs that were already in labels_data before the import are skipped.
+
+    :param files: Paths of the selected chip files.
+    :param labels_data: The session's list of label dictionaries, extended in place.
+    :param ask_type: See resolve_records.
+    :param index: LabelIndex kept alongside labels_data across imports; built from labels_data if not given.
+    :param parser: ChipFileParser holding the naming rules.
+    :param content_index: Optional file_identity.ContentIndex kept across imports. When given, a file
+                          with the same content as one imported before under another name is skipped
+                          and recorded in content_index.duplicates, and a file with new content whose
+                          order and type were already imported (a renamed reprint) is recorded in
+                          content_index.reprints.
+    :param stat_cache: Optional file_stats.StatCache; files are then checked on its thread pool
+                       and results it already holds are reused.
+    :param new_keys: Set of groups created by the current import, for an import fed in several
+                     calls (e.g. as background validation streams files in); a new import if None.
+    :param digests: Optional {path: digest} from content_index.digest_many, computed off the calling
+                    thread; files missing from it are hashed here.
+    :return: List of (file_name, label_entry) for the labels that were added.
+    """
+    added = []
+    if index is None:
+        index = LabelIndex(labels_data)
+
+    # Groups created by this import; any other group in the index existed before it
+    if new_keys is None:
+        new_keys = set()
+
+    # Validate if files exist and are accessible, then parse all names in one pass
+    existing_files = []
+    stats = {}
+    if stat_cache is not None:
+        for file_path, stat_result in stat_cache.stat_many(files):
+            if is_regular_file(stat_result):
+                existing_files.append(file_path)
+                stats[file_path] = stat_result
+            else:
+                logging.error(f"File not found or inaccessible: {file_path}")
+    else:
+        for file_path in files:
+            if os.path.isfile(file_path):
+                existing_files.append(file_path)
+            else:
+                logging.error(f"File not found or inaccessible: {file_path}")
+
+    # Hash the files in parallel up front, unless the caller already did; unchanged files reuse their cached digest
+    digests = dict(digests or {})
+    if content_index is not None:
+        unhashed = [file_path for file_path in existing_files if file_path not in digests]
+        if unhashed:
+            digests.update(content_index.digest_many(unhashed, stats))
+
+    # Skip copies first, so nobody is asked for the type of a file that is not imported
+    candidates = []  # (file_path, record, new_content)
+    for file_path, record in zip(existing_files, parser.parse_many(existing_files)):
+        try:
+            new_content = False
+            if content_index is not None:
+                digest = digests.get(file_path)
+                original_path = content_index.original_of(file_path, digest)
+                if original_path is not None:
+                    logging.warning(f"'{record.file_name}' has the same content as '{original_path}', skipping it")
+                    content_index.duplicates.append((file_path, original_path))
+                    continue
+                new_content = digest is not None and digest not in content_index.first_paths
+                content_index.add(file_path, digest)
+            candidates.append((file_path, record, new_content))
+        except Exception as e:
+            logging.error(f"Failed to process file '{record.file_name}': {str(e)}")
+
+    # Types of names without a keyword are asked for before the label loop, not in the middle of it
+    records = resolve_records([record for _file_path, record, _new_content in candidates], ask_type, parser)
+
+    for (file_path, parsed, new_content), record in zip(candidates, records):
+        if record is None:
+            continue
+        try:
+            # Check if this label has already been generated
+            key = (record.order_name, record.card_envelope)
+            if key in index and key not in new_keys:
+                if new_content:
+                    logging.warning(f"'{record.file_name}' has new content but its order and type were "
+                                    f"already imported, skipping it")
+                    content_index.reprints.append((file_path, record.order_name, record.card_envelope))
+                continue  # Skip if this order_name and card_envelope already exist
+
+            label_entry = {
+                "order_name": record.order_name,
+                "batch_chip": "1 of 1",  # Default batch_chip for single files
+                "card_envelope": record.card_envelope,
+                "num_records": record.num_records  # Store the number of records
+            }
+            labels_data.append(label_entry)
+            new_keys.add(index.add(label_entry))
+            added.append((record.file_name, label_entry))
+
+        except Exception as e:
+            # Log any unexpected exceptions during file processing
+            logging.error(f"Failed to process file '{parsed.file_name}': {str(e)}")
+
+    # Assign batch numbers to the groups this import added to
+    index.renumber(new_keys)
+    return added
+
+
+def apply_order_colors(labels_data, order_colors, default='black'):
+    """ Update labels_data to include color information before rendering. """
+    for label in labels_data:
+        label['color'] = order_colors.get(label['order_name'], default)
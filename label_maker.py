@@ -1,142 +1,189 @@
+import time
+
+# Taken before any heavy import so startup timing covers the whole cold start
+_STARTUP_T0 = time.perf_counter()
+
 import os
+import sys
 import customtkinter as ctk
 from tkinter import TclError, filedialog, messagebox, colorchooser, Menu
 import logging
-from PIL import Image, ImageDraw, ImageFont, features
-import qrcode
-from io import BytesIO
-
-# Set up logging to log errors to a file
-logging.basicConfig(filename='file_processing_errors.log',
-                    level=logging.ERROR,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Function to locate resource files, works for both PyInstaller executable and dev environment
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and PyInstaller """
-    import sys
-    try:
-        # PyInstaller creates a temporary folder and stores the path in sys._MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    
-    # Ensure backslashes for Windows paths
-    return os.path.join(base_path, relative_path).replace('\\', '/')
+import multiprocessing
+import queue
 
+from app_paths import get_cache_dir, get_data_dir, get_history_file_path, get_registry_path, resource_path
+from label_data import LabelIndex, add_labels_from_files, apply_order_colors
+from order_history import MAX_HISTORY_ENTRIES, OrderHistoryStore, lock_log
+from order_registry import OrderRegistry
+from file_list_view import VirtualFileList
 
-# Ensure the history file is stored in a user-writable location (not inside the executable)
-def get_history_file_path():
-    """ Get the writable path for the history file in a fixed directory on your computer. """
-    # Define the fixed path where you want the history file to be saved
-    base_path = r"G:\Shared drives\Scribe Workspace\Scribe Master Folder\Scribe Label Maker"
-        
-    # Ensure the directory exists (creates it if it doesn't exist)
-    os.makedirs(base_path, exist_ok=True)
-    
-    # Construct the full path for the history file
-    history_file_path = os.path.join(base_path, "order_history.json")
-    
-    return history_file_path
-
-# Set CustomTkinter appearance mode and color theme
-ctk.set_appearance_mode("light")
-ctk.set_default_color_theme("green")
+# Time from process start until the first frame is drawn that startup timing mode checks against
+STARTUP_BUDGET_SECONDS = 1.0
 
 # Global variables
 labels_data = []
+# Groups labels_data by (order_name, card_envelope) for duplicate checks and batch numbering
+label_index = LabelIndex()
 displayed_envelope_files = set()
 displayed_letter_files = set()
 order_colors = {}
 qr_codes = {}
 
-# Function to load order history from JSON file
-def load_order_history():
-    import json
-    history_file_path = get_history_file_path()
-    if os.path.exists(history_file_path):
-        with open(history_file_path, 'r') as file:
-            return json.load(file)
-    return []
-
-# Function to save order history to JSON file
-def save_order_history(history):
-    import json
-    history_file_path = get_history_file_path()
-    with open(history_file_path, 'w') as file:
-        json.dump(history, file)
-
-# Function to update the order history with the last 10 entries
-def update_order_history(order_name, color):
-    history = load_order_history()
-
-    # Remove any existing entries for the same order_name to ensure uniqueness
-    history = [entry for entry in history if entry['order_name'] != order_name]
-
-    # Add the new entry
-    history.append({"order_name": order_name, "color": color})
+# Number of processes used to render PDF pages in parallel
+RENDER_WORKERS = os.cpu_count() or 1
+# Seconds a watched folder must stay without new chip files before the PDF is created automatically
+WATCH_QUIET_SECONDS = 10.0
 
-    # Ensure only the last 20 unique entries are kept
-    if len(history) > 20:
-        history = history[-20:]
+# Cached order history shared by the history panel, the color dialogs and create_pdf
+history_store = OrderHistoryStore(get_history_file_path)
 
-    save_order_history(history)
+# Registry of every order's color, opened on first use, and whether order_history.json was imported into it
+order_registry = None
+order_registry_imported = False
 
-# Function to display the last 20 order_name and color combinations in the GUI
-def display_order_history():
-    # Clear previous displayed history
-    for widget in history_label_frame.winfo_children():
-        widget.destroy()
+def get_order_registry():
+    global order_registry, order_registry_imported
+    if order_registry is None:
+        try:
+            order_registry = OrderRegistry(get_registry_path())
+        except Exception as e:
+            logging.error(f"Failed to open the order registry: {str(e)}")
+            return None
 
-    history = load_order_history()
+    if not order_registry_imported:
+        # One-time import of the existing order_history.json; a failed import is tried again on the next call
+        try:
+            order_registry.import_json_history(history_store.path)
+            order_registry_imported = order_registry.json_history_imported()
+        except Exception as e:
+            logging.error(f"Failed to import order history into the registry: {str(e)}")
+    return order_registry
 
-    # Reverse the history to show newest entries first
-    history.reverse()
+# Function to load the most recent orders, re-reading the JSON file only when it changed
+def load_order_history():
+    history = history_store.load()
+    registry = get_order_registry()
+    if registry is None:
+        return history
+
+    # Pick up orders other stations added to the shared file, then read the newest from the registry
+    registry.sync_history(history)
+    return registry.recent(MAX_HISTORY_ENTRIES)
+
+# Function to look up the colors last used for orders, however long ago
+def lookup_order_colors(order_names):
+    registry = get_order_registry()
+    return registry.lookup_colors(order_names) if registry is not None else {}
+
+# Function to record a batch of (order_name, color) updates in the history file and the registry
+def record_order_colors(updates):
+    updates = list(updates)
+    try:
+        history_store.update_many(updates)
+        lock_stats = history_store.lock_stats()
+        if lock_stats["last_wait"] >= 0.5:
+            lock_log.info(f"Order history save waited {lock_stats['last_wait']:.2f} s for another station "
+                          f"({lock_stats['acquisitions']} saves this session, {lock_stats['total_wait']:.2f} s "
+                          f"waited in total, longest {lock_stats['max_wait']:.2f} s, "
+                          f"{lock_stats['stale_breaks']} stale locks removed)")
+    except OSError as e:
+        # The updates stay queued and are written by the next successful save
+        messagebox.showwarning("Order History", f"Order history could not be saved yet: {str(e)}")
+    registry = get_order_registry()
+    if registry is not None:
+        registry.record(updates)
+
+# Function to update the order history with the last 20 entries
+def update_order_history(order_name, color):
+    record_order_colors([(order_name, color)])
 
-    for entry in history:
-        order_name = entry['order_name']
-        color = entry['color']
+# Order history panel widgets, kept between refreshes: order_name -> label, and the colors they show
+history_widgets = {}
+history_widget_colors = {}
+# Order names in the order their labels are packed (newest first)
+history_order = []
 
-        # Populate the order_colors dictionary
-        order_colors[order_name] = color
+# Function to pick black or white text for a history entry's background color
+def history_text_color(hex_color):
+    hex_color = hex_color.lstrip("#")
+    try:
+        r, g, b = (
+            int(hex_color[0:2], 16),
+            int(hex_color[2:4], 16),
+            int(hex_color[4:6], 16),
+        )
+    except ValueError:
+        return "white"
+    brightness = (r * 299 + g * 587 + b * 114) / 1000  # Luminance formula
+    return "black" if brightness > 186 else "white"
 
-        # Determine the appropriate text color based on background brightness
-        def is_light_color(hex_color):
-            hex_color = hex_color.lstrip("#")
-            r, g, b = (
-                int(hex_color[0:2], 16),
-                int(hex_color[2:4], 16),
-                int(hex_color[4:6], 16),
-            )
-            brightness = (r * 299 + g * 587 + b * 114) / 1000  # Luminance formula
-            return brightness > 186
+def create_history_label(order_name, color):
+    order_label = ctk.CTkLabel(
+        history_label_frame,
+        text=order_name,
+        font=("Helvetica", 12),
+        text_color=history_text_color(color),
+    )
+    order_label.configure(fg_color=f"#{color}")  # Set the background color to the assigned color
 
-        text_color = "black" if is_light_color(color) else "white"
+    # Adjust bindtags to include history_label_frame
+    order_label.bindtags((str(order_label), str(history_label_frame), "all"))
 
-        # Create a label for each history entry with the background color set to the assigned color
-        order_label = ctk.CTkLabel(
-            history_label_frame,
-            text=order_name,
-            font=("Helvetica", 12),
-            text_color=text_color,
-        )
-        order_label.configure(fg_color=f"#{color}")  # Set the background color to the assigned color
-        order_label.pack(pady=2, padx=5, anchor="w", fill="x")
+    # Bind click event to change color
+    order_label.bind(
+        "<Button-1>",
+        lambda event, name=order_name, label=order_label: change_order_history_color(event, name, label),
+    )
+    return order_label
 
-        # Adjust bindtags to include history_label_frame
-        order_label.bindtags((str(order_label), str(history_label_frame), "all"))
+# Function to display the last 20 order_name and color combinations in the GUI, only touching the entries that changed
+def display_order_history():
+    history = load_order_history()
 
-        # Bind click event to change color
-        order_label.bind(
-            "<Button-1>",
-            lambda event, name=order_name, label=order_label: change_order_history_color(event, name, label),
-        )
+    # Reverse the history to show newest entries first
+    history.reverse()
+    new_order = [entry['order_name'] for entry in history]
+    new_colors = {entry['order_name']: entry['color'] for entry in history}
+
+    # Populate the order_colors dictionary
+    order_colors.update(new_colors)
+
+    # Destroy the labels of orders that dropped out of the history
+    for order_name in [name for name in history_order if name not in new_colors]:
+        history_widgets.pop(order_name).destroy()
+        history_widget_colors.pop(order_name, None)
+        history_order.remove(order_name)
+
+    for position, order_name in enumerate(new_order):
+        color = new_colors[order_name]
+        order_label = history_widgets.get(order_name)
+        if order_label is None:
+            order_label = create_history_label(order_name, color)
+            history_widgets[order_name] = order_label
+        elif history_widget_colors.get(order_name) != color:
+            # Recolor in place
+            order_label.configure(fg_color=f"#{color}", text_color=history_text_color(color))
+        history_widget_colors[order_name] = color
+
+        # Move (or first pack) the label only if it is not already at this position
+        if position < len(history_order) and history_order[position] == order_name:
+            continue
+        if order_name in history_order:
+            history_order.remove(order_name)
+        if position == 0:
+            if history_order:
+                order_label.pack(pady=2, padx=5, anchor="w", fill="x", before=history_widgets[history_order[0]])
+            else:
+                order_label.pack(pady=2, padx=5, anchor="w", fill="x")
+        else:
+            order_label.pack(pady=2, padx=5, anchor="w", fill="x", after=history_widgets[new_order[position - 1]])
+        history_order.insert(position, order_name)
 
 # Function to select Envelope Chip files
 def select_envelope_files():
     files = filedialog.askopenfilenames(title="Select Envelope Chip Files")
     if files:
-        generate_labels_data(files, "Envelopes")
+        start_file_validation(files, "Envelopes")
     else:
         messagebox.showerror("Error", "No Envelope Chip files selected!")
 
@@ -144,134 +191,167 @@ def select_envelope_files():
 def select_letter_files():
     files = filedialog.askopenfilenames(title="Select Letter Chip Files")
     if files:
-        generate_labels_data(files, "Letters")
+        start_file_validation(files, "Letters")
     else:
         messagebox.showerror("Error", "No Letter Chip files selected!")
 
-# Function to generate the labels data based on selected files
-def generate_labels_data(files, chip_type):
-    import logging
-    from collections import defaultdict
-    import re
-    global labels_data, displayed_envelope_files, displayed_letter_files, order_colors
-    valid_files = []  # To store valid files for display in the labels
-    order_type_count = defaultdict(list)  # To group by order_name and card_envelope type
-    invalid_files = []  # List to track invalid files
+# Background check of selected files: the running job and the queue its thread streams results through
+validation_job = None
+validation_events = queue.Queue()
+
+# Function to check selected files on a thread pool, streaming the valid ones into the lists as they are checked
+def start_file_validation(files, chip_type):
+    global validation_job
+    import threading
+    from file_stats import default_cache as stat_cache, is_regular_file
 
-    # Convert labels_data into a set of existing (order_name, card_envelope) pairs to check for duplicates
-    existing_labels = {(entry['order_name'], entry['card_envelope']) for entry in labels_data}
+    if validation_job is not None:
+        messagebox.showinfo("Select Files", "Still checking the previously selected files, please wait.")
+        return
 
-    for file_path in files:
+    # With the duplicate check on, the files are hashed here too, so the Tk thread never reads them
+    content_index = get_content_index() if dedupe_content_switch.get() else None
+
+    def send(chunk, stats):
+        digests = content_index.digest_many(list(stats), stats) if content_index is not None and stats else {}
+        validation_events.put(("chunk", (chunk, digests)))
+
+    def run():
+        chunk = []
+        stats = {}
+        last_sent = time.monotonic()
+        # Results come back in selection order, so batch numbers match a one-shot import
+        for path, stat_result in stat_cache.stat_many(files):
+            chunk.append((path, is_regular_file(stat_result)))
+            if is_regular_file(stat_result):
+                stats[path] = stat_result
+            if len(chunk) >= 100 or time.monotonic() - last_sent >= 0.1:
+                send(chunk, stats)
+                chunk = []
+                stats = {}
+                last_sent = time.monotonic()
+        send(chunk, stats)
+        validation_events.put(("done", None))
+
+    # new_keys makes the streamed chunks one import, so several files of an order become its batches
+    validation_job = {"chip_type": chip_type, "new_keys": set(), "total": len(files), "checked": 0, "added": 0}
+    file_check_label.configure(text=f"Checking {len(files)} files...")
+    threading.Thread(target=run, name="FileValidation", daemon=True).start()
+    root.after(50, poll_file_validation)
+
+# Function to add the checked files to labels_data on the Tk main loop
+def poll_file_validation():
+    global validation_job
+    job = validation_job
+    while True:
         try:
-            # Validate if file exists and is accessible
-            if not os.path.isfile(file_path):
-                logging.error(f"File not found or inaccessible: {file_path}")
-                continue
-
-            file_name = os.path.basename(file_path)
-            base_name = os.path.splitext(file_name)[0]  # Remove the extension (e.g., ".bin")
-
-            # Check if the file name contains "Envelopes" or "Letters"
-            if "Envelopes" in base_name:
-                card_envelope = "Envelope"
-                parts = base_name.split("Envelopes")
-                order_name = parts[0].strip()
-                rest = parts[1].strip()
-            elif "Letters" in base_name:
-                card_envelope = "Card"
-                parts = base_name.split("Letters")
-                order_name = parts[0].strip()
-                rest = parts[1].strip()
-            else:
-                # Prompt the user to select the type
-                selected_type = ask_envelope_or_letter(file_name)
-                if not selected_type:
-                    # User cancelled or closed the dialog
-                    continue
-                if selected_type == "Envelopes":
-                    card_envelope = "Envelope"
-                elif selected_type == "Letters":
-                    card_envelope = "Card"
-                else:
-                    # Invalid selection
-                    continue
-                # Since we don't have "Envelopes" or "Letters" in the base_name,
-                # we'll assume the entire base_name is the order_name
-                order_name = base_name.strip()
-                rest = ''
-
-            # Now try to extract the range from rest or base_name
-            if rest:
-                range_match_string = rest
-            else:
-                range_match_string = base_name
-
-            # Extract the range using regex
-            match = re.search(r'(\d+)-(\d+)', range_match_string)
-            if match:
-                start_num = int(match.group(1))
-                end_num = int(match.group(2))
-                num_records = end_num - start_num + 1
-                # Remove the range from order_name if it was in order_name
-                if not rest:
-                    order_name = order_name[:match.start()].strip()
-            else:
-                num_records = None
-
-            # Check if this label has already been generated
-            if (order_name, card_envelope) in existing_labels:
-                continue  # Skip if this order_name and card_envelope already exist
-
-            # Append valid files to labels_data
-            label_entry = {
-                "order_name": order_name,
-                "batch_chip": "1 of 1",  # Default batch_chip for single files
-                "card_envelope": card_envelope,
-                "num_records": num_records  # Store the number of records
-            }
-            labels_data.append(label_entry)
-
-            # Add valid files to the appropriate set for preventing duplicates
-            if card_envelope == "Envelope" and file_name not in displayed_envelope_files:
-                valid_files.append(file_name)
-                displayed_envelope_files.add(file_name)
-            elif card_envelope == "Card" and file_name not in displayed_letter_files:
-                valid_files.append(file_name)
-                displayed_letter_files.add(file_name)
-
-            # Prompt for color if order_name doesn't already have one
-            if order_name not in order_colors:
-                assign_color_for_order(order_name)
+            kind, event = validation_events.get_nowait()
+        except queue.Empty:
+            break
 
-        except Exception as e:
-            # Log any unexpected exceptions during file processing
-            logging.error(f"Failed to process file '{file_path}': {str(e)}")
-
-    # Notify the user if there were any invalid files
-    if invalid_files:
-        invalid_file_list = "\n".join(invalid_files)
-        messagebox.showerror("Invalid Files", f"The following files were invalid for {chip_type}:\n{invalid_file_list}")
-
-    # Update the labels_data entries to assign batch numbers if there are multiple files per order
-    order_type_files = defaultdict(list)
-    for label in labels_data:
-        key = (label['order_name'], label['card_envelope'])
-        order_type_files[key].append(label)
-
-    for (order_name, card_envelope), labels in order_type_files.items():
-        total_batches = len(labels)
-        for i, label in enumerate(labels):
-            label['batch_chip'] = f"{i + 1} of {total_batches}"
-
-    # Display only valid and non-duplicate files in the appropriate label
+        if kind == "done":
+            validation_job = None
+            file_check_label.configure(text=f"Added {job['added']} labels from {job['total']} selected files")
+            return
+
+        chunk, digests = event
+        job["checked"] += len(chunk)
+        valid_files = []
+        for path, is_file in chunk:
+            if is_file:
+                valid_files.append(path)
+            else:
+                logging.error(f"File not found or inaccessible: {path}")
+        if valid_files:
+            added = generate_labels_data(valid_files, job["chip_type"], new_keys=job["new_keys"], digests=digests)
+            job["added"] += len(added)
+        file_check_label.configure(text=f"Checked {job['checked']} of {job['total']} files...")
+
+    root.after(50, poll_file_validation)
+
+# Content digests of this session's chip files, created when the duplicate check is first used
+content_index = None
+
+def get_content_index():
+    global content_index
+    if content_index is None:
+        from file_identity import ContentIndex
+        content_index = ContentIndex()
+    return content_index
+
+# Function to list the files skipped because another file has the same content, or because they are renamed reprints
+def show_duplicate_files(duplicates, reprints=()):
+    def listed(lines):
+        if len(lines) > 15:
+            lines = lines[:15] + [f"... and {len(lines) - 15} more"]
+        return "\n".join(lines)
+
+    sections = []
+    if duplicates:
+        sections.append("These files have the same content as files already selected and were skipped:\n\n"
+                        + listed([f"{os.path.basename(path)}  =  {os.path.basename(original)}"
+                                  for path, original in duplicates]))
+    if reprints:
+        sections.append("These files have new content, but a label for their order and type was already "
+                        "created, so they were skipped:\n\n"
+                        + listed([f"{os.path.basename(path)}  ({order_name}, {card_envelope})"
+                                  for path, order_name, card_envelope in reprints]))
+    messagebox.showwarning("Duplicate Chip Files", "\n\n".join(sections))
+
+# Function to generate the labels data based on selected files; with no chip_type, files are listed by their own type
+def generate_labels_data(files, chip_type=None, new_keys=None, digests=None):
+    global labels_data, displayed_envelope_files, displayed_letter_files, order_colors
+    valid_files = []  # To store valid files for display in the labels
+    valid_files_by_type = {"Envelope": [], "Card": []}
+    new_orders = []  # Orders without a color yet, in the order their files were added
+
+    # Optionally skip copies of chips already imported under another name
+    content_index = None
+    if dedupe_content_switch.get():
+        content_index = get_content_index()
+    duplicates_before = len(content_index.duplicates) if content_index is not None else 0
+    reprints_before = len(content_index.reprints) if content_index is not None else 0
+
+    # File checks reuse the stat results of the background validation
+    from file_stats import default_cache as stat_cache
+    added = add_labels_from_files(files, labels_data, ask_type=ask_envelope_or_letter, index=label_index,
+                                  content_index=content_index, stat_cache=stat_cache, new_keys=new_keys,
+                                  digests=digests)
+
+    if content_index is not None and (len(content_index.duplicates) > duplicates_before
+                                      or len(content_index.reprints) > reprints_before):
+        show_duplicate_files(content_index.duplicates[duplicates_before:], content_index.reprints[reprints_before:])
+
+    for file_name, label_entry in added:
+        order_name = label_entry["order_name"]
+        card_envelope = label_entry["card_envelope"]
+
+        # Add valid files to the appropriate set for preventing duplicates
+        if card_envelope == "Envelope" and file_name not in displayed_envelope_files:
+            valid_files.append(file_name)
+            valid_files_by_type[card_envelope].append(file_name)
+            displayed_envelope_files.add(file_name)
+        elif card_envelope == "Card" and file_name not in displayed_letter_files:
+            valid_files.append(file_name)
+            valid_files_by_type[card_envelope].append(file_name)
+            displayed_letter_files.add(file_name)
+
+        if order_name not in order_colors and order_name not in new_orders:
+            new_orders.append(order_name)
+
+    # Give every new order of the import a color in one pass
+    assign_order_colors(new_orders)
+
+    # Display only valid and non-duplicate files in the appropriate list
     if valid_files:
-        file_names = "\n".join(valid_files)
         if chip_type == "Envelopes":
-            current_text = envelope_label.cget("text")
-            envelope_label.configure(text=current_text + file_names + "\n")
+            envelope_files_list.append(valid_files)
         elif chip_type == "Letters":
-            current_text = letter_label.cget("text")
-            letter_label.configure(text=current_text + file_names + "\n")
+            letter_files_list.append(valid_files)
+        else:
+            envelope_files_list.append(valid_files_by_type["Envelope"])
+            letter_files_list.append(valid_files_by_type["Card"])
+    return added
 
 def ask_envelope_or_letter(file_name):
     import customtkinter as ctk
@@ -320,6 +400,30 @@ def ask_envelope_or_letter(file_name):
 
     return result[0]
 
+# Function to color new orders: a past order's color first, then an automatic color or the color picker
+def assign_order_colors(order_names):
+    stored_colors = lookup_order_colors(order_names)
+    remaining = []
+    for order_name in order_names:
+        if order_name in stored_colors:
+            order_colors[order_name] = stored_colors[order_name]
+            display_order_color(order_name, f"#{stored_colors[order_name]}")
+        else:
+            remaining.append(order_name)
+
+    if not remaining:
+        return
+    if auto_color_switch.get():
+        from color_assign import pick_distinct_colors
+
+        # Keep new colors apart from this session's and the recent history's colors
+        for order_name, color in zip(remaining, pick_distinct_colors(len(remaining), used=order_colors.values())):
+            order_colors[order_name] = color
+            display_order_color(order_name, f"#{color}")
+    else:
+        for order_name in remaining:
+            assign_color_for_order(order_name)
+
 # Function to prompt user for a color for each unique order_name
 def assign_color_for_order(order_name):
     color = colorchooser.askcolor(title=f"Choose color for {order_name}")
@@ -327,6 +431,60 @@ def assign_color_for_order(order_name):
         order_colors[order_name] = color[1][1:]
         display_order_color(order_name, color[1])
 
+color_review_window = None
+
+# Function to review and override this session's order colors in one grid
+def review_order_colors():
+    global color_review_window
+
+    session_orders = list(dict.fromkeys(label['order_name'] for label in labels_data))
+    if not session_orders:
+        messagebox.showerror("Error", "No orders to review.")
+        return
+
+    if color_review_window is not None and color_review_window.winfo_exists():
+        color_review_window.destroy()
+
+    window = ctk.CTkToplevel(root)
+    window.title("Review Order Colors")
+    window.geometry("660x480")
+    window.transient(root)
+
+    hint_label = ctk.CTkLabel(window, text="Click an order to change its color.", font=("Helvetica", 12))
+    hint_label.pack(pady=(10, 0))
+
+    grid_frame = ctk.CTkScrollableFrame(window, fg_color="#3A3A3A")
+    grid_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+    columns = 3
+    for column in range(columns):
+        grid_frame.grid_columnconfigure(column, weight=1)
+
+    for i, order_name in enumerate(session_orders):
+        color = order_colors.get(order_name, "000000")
+        order_button = ctk.CTkButton(grid_frame, text=order_name, fg_color=f"#{color}", hover=False,
+                                     text_color=history_text_color(color))
+        order_button.configure(command=lambda name=order_name, button=order_button: override_order_color(name, button))
+        order_button.grid(row=i // columns, column=i % columns, padx=4, pady=4, sticky="ew")
+
+    color_review_window = window
+
+# Function to change an order's color from the review grid
+def override_order_color(order_name, order_button):
+    color = colorchooser.askcolor(title=f"Choose a new color for {order_name}", parent=color_review_window)
+    if not color[1]:
+        return
+
+    new_color = color[1][1:]
+    order_colors[order_name] = new_color
+    text_color = history_text_color(new_color)
+    order_button.configure(fg_color=color[1], text_color=text_color)
+
+    # Keep the order's "assigned color" label in the main window in step
+    color_label = order_color_labels.get(order_name)
+    if color_label is not None and color_label.winfo_exists():
+        color_label.configure(fg_color=color[1], text_color=text_color)
+
 # Function to change the color when the label is clicked
 def change_color(order_name, color_label):
     color = colorchooser.askcolor(title=f"Choose a new color for {order_name}")
@@ -334,6 +492,9 @@ def change_color(order_name, color_label):
         order_colors[order_name] = color[1][1:]
         color_label.configure(fg_color=color[1])
 
+# "assigned color" labels shown for this session's orders: order_name -> label
+order_color_labels = {}
+
 # Function to display the order color
 def display_order_color(order_name, color_hex):
     def is_light_color(hex_color):
@@ -344,8 +505,8 @@ def display_order_color(order_name, color_hex):
 
     text_color = "black" if is_light_color(color_hex) else "white"
 
-    envelope_label.pack_forget()
-    letter_label.pack_forget()
+    envelope_files_list.pack_forget()
+    letter_files_list.pack_forget()
 
     # Create the color label
     color_label = ctk.CTkLabel(
@@ -357,12 +518,13 @@ def display_order_color(order_name, color_hex):
     
     # Bind the left-click event to change the label color
     color_label.bind("<Button-1>", lambda event: change_label_color_on_click(event, color_label))
+    order_color_labels[order_name] = color_label
 
     # Pack the label
     color_label.pack(pady=5, padx=20)
 
-    letter_label.pack(pady=10, padx=20, fill="x", side="bottom")
-    envelope_label.pack(pady=10, padx=20, fill="x", side="bottom")
+    letter_files_list.pack(pady=10, padx=20, fill="x", side="bottom")
+    envelope_files_list.pack(pady=10, padx=20, fill="x", side="bottom")
 
 def change_label_color_on_click(event, label):
     # Prompt the user to choose a new color
@@ -400,150 +562,44 @@ def change_order_history_color(event, order_name, order_label):
     if color[1]:
         new_color = color[1][1:]  # Remove the '#' from the color code
         order_colors[order_name] = new_color
-        order_label.configure(fg_color=color[1])
-
-        # Update text color based on brightness
-        def is_light_color(hex_color):
-            hex_color = hex_color.lstrip("#")
-            r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
-            brightness = (r * 299 + g * 587 + b * 114) / 1000
-            return brightness > 186
-
-        text_color = "black" if is_light_color(new_color) else "white"
-        order_label.configure(text_color=text_color)
+        order_label.configure(fg_color=color[1], text_color=history_text_color(new_color))
+        history_widget_colors[order_name] = new_color
 
         # Update the order history
         update_order_history(order_name, new_color)
 
-def generate_labels_pdf(labels_data, qr_codes, output_pdf="labels_with_qr.pdf"):
-    """
-    Generates a multi-page PDF of labels with a 2x6 layout and QR codes for standard letter-sized paper (8.5x11 inches).
-
-    :param labels_data: List of dictionaries with label data (order_name, batch_chip, card_envelope, color, num_records).
-    :param qr_codes: Dictionary mapping order_name to its QR code URL.
-    :param output_pdf: Output file name for the generated PDF.
-    """
-
-    # Define page dimensions for 8.5 x 11 inches at 300 DPI
-    PAGE_WIDTH, PAGE_HEIGHT = 2550, 3300  # 8.5 x 11 inches at 300 DPI
-    MARGIN = 80  # Margin in pixels
-    LABEL_WIDTH, LABEL_HEIGHT = 1100, 450  # Label dimensions for 2x6 grid
-    GAP_X, GAP_Y = 150, 80  # Gaps between labels horizontally and vertically
-
-    # Load fonts using the resource_path function from your existing code
-    font_path = resource_path('resources/Arial_Bold.ttf')  # Adjust the path as needed
-    if not os.path.exists(font_path):
-        messagebox.showerror("Error", f"Font file not found at {font_path}")
-        return
-
-    font_large = ImageFont.truetype(font_path, 60)
-    font_medium = ImageFont.truetype(font_path, 50)
-    font_small = ImageFont.truetype(font_path, 40)  # Added a smaller font size for num_records
-
-    # Prepare to store pages
-    pages = []
-
-    # Number of rows and columns for the 2x6 layout
-    num_rows = 6
-    num_cols = 2
-    labels_per_page = num_rows * num_cols
-
-    for page_num in range((len(labels_data) + labels_per_page - 1) // labels_per_page):
-        # Create a blank canvas for the page
-        page = Image.new("RGB", (PAGE_WIDTH, PAGE_HEIGHT), "white")
-        draw = ImageDraw.Draw(page)
-
-        # Calculate start and end indices for labels on this page
-        start_index = page_num * labels_per_page
-        end_index = min(start_index + labels_per_page, len(labels_data))
-
-        # Calculate label positions column-first
-        positions = []
-        for col in range(num_cols):
-            for row in range(num_rows):
-                x_start = MARGIN + col * (LABEL_WIDTH + GAP_X)
-                y_start = MARGIN + row * (LABEL_HEIGHT + GAP_Y)
-                positions.append((x_start, y_start))
-
-        # Draw labels for this page
-        for i, label_index in enumerate(range(start_index, end_index)):
-            x_start, y_start = positions[i]
-            x_end = x_start + LABEL_WIDTH
-            y_end = y_start + LABEL_HEIGHT
-
-            # Draw label box
-            draw.rectangle([x_start, y_start, x_end, y_end], outline="black", width=3)
-    
-            # Calculate the position of the vertical line
-            x_line = x_start + (LABEL_WIDTH - 450) // 2  # Line in the middle of the label (adjusted with - 500)
-
-            # Draw the vertical line
-            draw.line([(x_line, y_start + 200), (x_line, y_end - 100)], fill="black", width=5)
-
-            # Add label text
-            label = labels_data[label_index]
-            order_name = label["order_name"]
-            batch_chip = label["batch_chip"]
-            card_envelope = label["card_envelope"]
-            num_records = label.get('num_records', None)
-            text_color = label.get('color', "black")
-
-            # Ensure text_color is in a format PIL can use
-            if isinstance(text_color, str):
-                if not text_color.startswith('#') and len(text_color) == 6:
-                    text_color = '#' + text_color  # Add '#' if missing
-                # PIL can handle color names and hex strings with '#'
-
-            # Draw the text onto the label
-            draw.text((x_start + 20, y_start + 20), f"Order Name & Number:", fill='black', font=font_medium)
-            draw.text((x_start + 30, y_start + 90), order_name, fill=text_color, font=font_large)
-            draw.text((x_start + 20, y_start + 200), "Chip #:", fill='black', font=font_medium)
-            draw.text((x_start + 30, y_start + 265), batch_chip, fill=text_color, font=font_large)
-            if num_records is not None:
-                draw.text((x_start + 400, y_start + 200), f"# of Records:", fill='black', font=font_medium)
-                draw.text((x_start + 480, y_start + 265), str(num_records), fill=text_color, font=font_medium)
-                # Adjust positions as needed to fit all text
-            else:
-                # If num_records is not available, adjust the positions of "Type:"
-                y_type = y_start + 320
-            draw.text((x_start + 20, y_start + 360), "Type:", fill='black', font=font_medium)
-            draw.text((x_start + 170, y_start + 360), card_envelope, fill=text_color, font=font_large)
-
-            # Add QR code if it exists for the order
-            if order_name in qr_codes:
-                qr = qrcode.QRCode()
-                qr.add_data(qr_codes[order_name])
-                qr.make(fit=True)
-
-                # Generate QR code image
-                qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-                qr_size = 250  # QR code size
-                qr_img = qr_img.resize((qr_size, qr_size))
-                qr_position = (x_end - qr_size - 20, y_start + 190)  # Position near top-right of label
-                page.paste(qr_img, qr_position)
-
-        # Append this page to the pages list
-        pages.append(page)
-
-    # Save pages as a single PDF
-    if pages:
-        pages[0].save(output_pdf, save_all=True, append_images=pages[1:], resolution=300)
-        print(f"Labels saved to {output_pdf}")
-    else:
-        messagebox.showerror("Error", "No pages were created. Check if labels_data is populated correctly.")
+# Background PDF job: the running job's state, and the queue its worker thread reports through
+pdf_job = None
+pdf_job_events = queue.Queue()
 
 # Function to create and save the PDF file and display the "Open File" button if successful
-def create_pdf():
-    if not labels_data:
+# (batch_labels: labels to print instead of the whole session, e.g. one watch folder batch)
+def create_pdf(file_name=None, batch_labels=None):
+    pdf_labels = labels_data if batch_labels is None else batch_labels
+    if not pdf_labels:
         messagebox.showerror("Error", "No valid files selected!")
         return
 
+    if pdf_job is not None:
+        messagebox.showinfo("Create PDF", "A PDF is already being created.")
+        return
+
     try:
         import logging
         from tkinter import simpledialog
 
+        # The rendering stack (PIL, qrcode, fonts) is loaded on the first PDF, not at startup
+        import page_cache
+        import qr_cache
+
+        # Keep generated QR codes on the local disk so each URL is encoded once per machine
+        qr_cache.configure_default_cache(cache_dir=get_cache_dir("qr_codes"))
+        # Keep encoded pages too, so creating the PDF again after a small edit only renders the changed pages
+        page_cache.configure_default_cache(cache_dir=get_cache_dir("pages"))
+
         # Prompt the user for a file name
-        file_name = simpledialog.askstring("Input", "Enter the file name for the PDF:", parent=root)
+        if file_name is None:
+            file_name = simpledialog.askstring("Input", "Enter the file name for the PDF:", parent=root)
         
         if not file_name:
             messagebox.showerror("Error", "File name not specified.")
@@ -558,34 +614,230 @@ def create_pdf():
         # Construct the full save path using os.path.join and os.path.normpath
         save_path = os.path.normpath(os.path.join(save_directory, f"{file_name}.pdf"))
 
-        # Print the save path for debugging
-        print(f"PDF will be saved to: {save_path}")
+        # Log the save path for debugging
+        logging.info(f"PDF will be saved to: {save_path}")
 
-        # Update labels_data to include color information
-        for label in labels_data:
-            label['color'] = order_colors.get(label['order_name'], 'black')
+        # Late chip files for a batch that was already created can be added to its PDF
+        append = False
+        if os.path.exists(save_path):
+            answer = messagebox.askyesnocancel(
+                "Create PDF", f"{file_name}.pdf already exists.\n\nYes: add these labels to the end of it.\n"
+                              "No: replace it.", parent=root)
+            if answer is None:
+                return
+            append = answer
 
-        # Call generate_labels_pdf
-        generate_labels_pdf(labels_data, qr_codes, output_pdf=save_path)
+        # Update the labels to include color information
+        apply_order_colors(pdf_labels, order_colors)
 
-        # Check if the file was created
-        if not os.path.exists(save_path):
-            messagebox.showerror("Error", f"The PDF file was not created at {save_path}")
-            return
+        # Render a copy, so files added while the PDF is being created (e.g. by the watch folder) don't change it
+        job_labels = [dict(label) for label in pdf_labels]
+        backend = "vector" if vector_pdf_switch.get() else "raster"
+        resolution = RESOLUTION_CHOICES[resolution_button.get()]
+        start_pdf_job(job_labels, dict(qr_codes), save_path, backend, append, resolution)
+
+    except Exception as e:
+        logging.error(f"Failed to create the PDF file: {str(e)}")
+        messagebox.showerror("Error", f"Failed to create the PDF file: {str(e)}")
 
+# Raster resolution profiles offered next to "Create PDF" (label_render.RESOLUTION_PROFILES)
+RESOLUTION_CHOICES = {"Draft 150 DPI": "draft", "Standard 300 DPI": "standard", "High 600 DPI": "high"}
+
+# Function to render the PDF on a worker thread while a progress window shows pages done, ETA and Cancel
+def start_pdf_job(job_labels, job_qr_codes, save_path, backend, append=False, resolution="standard"):
+    global pdf_job
+    import threading
+
+    cancel = threading.Event()
+
+    def run():
+        from label_render import RenderCancelled, generate_labels_pdf
+        try:
+            generate_labels_pdf(job_labels, job_qr_codes, output_pdf=save_path, backend=backend, streaming=True,
+                                workers=RENDER_WORKERS,
+                                progress=lambda done, total: pdf_job_events.put(("progress", (done, total))),
+                                cancel=cancel, append=append, resolution=resolution)
+            pdf_job_events.put(("done", None))
+        except RenderCancelled:
+            pdf_job_events.put(("cancelled", None))
+        except Exception as e:
+            pdf_job_events.put(("error", e))
+
+    def request_cancel():
+        cancel.set()
+        cancel_button.configure(text="Cancelling...", state="disabled")
+
+    progress_window = ctk.CTkToplevel(root)
+    progress_window.title("Creating PDF")
+    progress_window.geometry("360x150")
+    progress_window.transient(root)
+    progress_window.protocol("WM_DELETE_WINDOW", request_cancel)
+
+    status_label = ctk.CTkLabel(progress_window, text="Preparing pages...", font=("Helvetica", 12))
+    status_label.pack(pady=(15, 5), padx=20)
+    progress_bar = ctk.CTkProgressBar(progress_window, width=300)
+    progress_bar.set(0)
+    progress_bar.pack(pady=5, padx=20)
+    cancel_button = ctk.CTkButton(progress_window, text="Cancel", command=request_cancel, width=100,
+                                  fg_color="#8e1313", hover_color="#c32626")
+    cancel_button.pack(pady=10)
+
+    pdf_job = {
+        "labels": job_labels,
+        "save_path": save_path,
+        "append": append,
+        "started": time.perf_counter(),
+        "window": progress_window,
+        "status_label": status_label,
+        "progress_bar": progress_bar,
+    }
+    threading.Thread(target=run, name="PDFRender", daemon=True).start()
+    root.after(100, poll_pdf_job)
+
+# Function to show the worker thread's progress and finish the job on the Tk main loop
+def poll_pdf_job():
+    global pdf_job
+    job = pdf_job
+    while True:
+        try:
+            kind, value = pdf_job_events.get_nowait()
+        except queue.Empty:
+            break
+
+        if kind == "progress":
+            done, total = value
+            elapsed = time.perf_counter() - job["started"]
+            remaining = int(elapsed / done * (total - done) + 0.5)
+            job["progress_bar"].set(done / total)
+            job["status_label"].configure(
+                text=f"Page {done} of {total} - about {remaining // 60}:{remaining % 60:02d} left")
+            continue
+
+        job["window"].destroy()
+        pdf_job = None
+        if kind == "done":
+            finish_pdf(job["labels"], job["save_path"], job["append"])
+        elif kind == "cancelled":
+            if job["append"]:
+                messagebox.showinfo("Create PDF", "Cancelled. The existing PDF was left unchanged.")
+            else:
+                messagebox.showinfo("Create PDF", "PDF creation cancelled. No file was saved.")
+        else:
+            logging.error(f"Failed to create the PDF file: {str(value)}")
+            messagebox.showerror("Error", f"Failed to create the PDF file: {str(value)}")
+        return
+
+    root.after(100, poll_pdf_job)
+
+# Function to report a finished PDF and record its order colors
+def finish_pdf(job_labels, save_path, append=False):
+    # Check if the file was created
+    if not os.path.exists(save_path):
+        messagebox.showerror("Error", f"The PDF file was not created at {save_path}")
+        return
+
+    if append:
+        messagebox.showinfo("Success", f"{len(job_labels)} labels added to {save_path}")
+    else:
         messagebox.showinfo("Success", f"Labels saved to {save_path}")
-        open_button.configure(command=lambda: open_pdf_file(save_path))
-        open_button.pack(pady=10, padx=20, before=reset_button)
+    open_button.configure(command=lambda: open_pdf_file(save_path))
+    open_button.pack(pady=10, padx=20, before=reset_button)
 
-        # Update order history
-        for label in labels_data:
-            update_order_history(label['order_name'], order_colors[label['order_name']])
+    # Update order history with one write for the whole batch
+    record_order_colors((label['order_name'], label['color'])
+                        for label in job_labels if label['order_name'] in order_colors)
 
-        display_order_history()
+    display_order_history()
+
+# Print preview state: the open window, the page it shows and the key of the image on screen
+preview_window = None
+preview_state = {}
+PREVIEW_SIZE = (600, 776)
+
+# Function to show the labels page by page at screen resolution, without writing the print PDF
+def open_preview_window():
+    global preview_window
 
+    if not labels_data:
+        messagebox.showerror("Error", "No valid files selected!")
+        return
+
+    try:
+        if preview_window is not None and preview_window.winfo_exists():
+            preview_window.lift()
+            preview_window.focus_force()
+            return
+    except (AttributeError, TclError):
+        pass
+
+    import qr_cache
+    qr_cache.configure_default_cache(cache_dir=get_cache_dir("qr_codes"))
+
+    preview_window = ctk.CTkToplevel(root)
+    preview_window.title("Print Preview")
+    preview_window.geometry(f"{PREVIEW_SIZE[0] + 40}x{PREVIEW_SIZE[1] + 90}")
+    preview_window.transient(root)
+
+    nav_frame = ctk.CTkFrame(preview_window, fg_color="transparent")
+    nav_frame.pack(pady=8)
+    ctk.CTkButton(nav_frame, text="< Previous", width=100, command=lambda: show_preview_page(-1),
+                  fg_color="#6c757d", hover_color="#adb5bd").pack(side="left", padx=5)
+    page_label = ctk.CTkLabel(nav_frame, text="", width=140)
+    page_label.pack(side="left", padx=5)
+    ctk.CTkButton(nav_frame, text="Next >", width=100, command=lambda: show_preview_page(1),
+                  fg_color="#6c757d", hover_color="#adb5bd").pack(side="left", padx=5)
+
+    image_label = ctk.CTkLabel(preview_window, text="")
+    image_label.pack(pady=5, padx=20)
+
+    preview_state.clear()
+    preview_state.update(page=0, key=None, page_label=page_label, image_label=image_label)
+    poll_preview(preview_window)
+
+# Function to move the preview by ``step`` pages
+def show_preview_page(step):
+    preview_state["page"] = preview_state.get("page", 0) + step
+    refresh_preview()
+
+# Function to draw the previewed page, only if something on it changed since it was last drawn
+def refresh_preview():
+    import label_preview
+
+    total = label_preview.page_count(labels_data)
+    if total == 0:
+        preview_state["page_label"].configure(text="No labels")
+        preview_state["image_label"].configure(image=None)
+        preview_state["key"] = None
+        return
+
+    page = max(0, min(preview_state["page"], total - 1))
+    preview_state["page"] = page
+    preview_state["page_label"].configure(text=f"Page {page + 1} of {total}")
+
+    # Colors are applied to a copy, the same way create_pdf applies them before rendering
+    page_labels = [dict(label) for label in label_preview.page_slice(labels_data, page)]
+    apply_order_colors(page_labels, order_colors)
+    dpi = label_preview.dpi_to_fit(*PREVIEW_SIZE)
+    key = label_preview.default_cache.page_key(page_labels, qr_codes, dpi)
+    if key == preview_state["key"]:
+        return
+
+    image = label_preview.default_cache.get_page(page_labels, qr_codes, dpi)
+    preview_state["image_label"].configure(image=ctk.CTkImage(light_image=image, size=image.size))
+    preview_state["key"] = key
+
+# Function to keep the open preview up to date as files, colors and QR codes change
+def poll_preview(window):
+    try:
+        if preview_window is not window or not window.winfo_exists():
+            return
+        refresh_preview()
     except Exception as e:
-        logging.error(f"Failed to create the PDF file: {str(e)}")
-        messagebox.showerror("Error", f"Failed to create the PDF file: {str(e)}")
+        logging.error(f"Failed to draw the print preview: {str(e)}")
+        messagebox.showerror("Error", f"Failed to draw the print preview: {str(e)}")
+        window.destroy()
+        return
+    root.after(500, lambda: poll_preview(window))
 
 def open_pdf_file(file_path):
     import platform
@@ -616,22 +868,104 @@ def reset_data():
 
     # Clear all relevant data
     labels_data.clear()
+    label_index.clear()
+    if content_index is not None:
+        content_index.clear()
     displayed_envelope_files.clear()
     displayed_letter_files.clear()
     order_colors.clear()
+    watch_pending_labels.clear()
 
-    # Reset label texts
-    envelope_label.configure(text="Selected Envelope Files:\n")
-    letter_label.configure(text="Selected Letter Files:\n")
+    # Empty the selected file lists
+    envelope_files_list.clear()
+    letter_files_list.clear()
 
     # Destroy any color assignment labels
     for widget in scrollable_frame.winfo_children():
         if isinstance(widget, ctk.CTkLabel) and "assigned color" in widget.cget("text"):
             widget.destroy()
+    order_color_labels.clear()
 
     # Hide the open button
     open_button.pack_forget()
 
+# Watch folder state: the running FolderWatcher, the queue its thread hands batches over with
+# and the labels that arrived since the last automatic PDF
+folder_watcher = None
+watch_events = queue.Queue()
+watch_pending_labels = []
+
+# Function to start or stop watching a folder for new chip files
+def toggle_watch_folder():
+    global folder_watcher
+
+    if folder_watcher is not None:
+        folder_watcher.stop()
+        folder_watcher = None
+        # Drop batches the stopped watcher had not handed over yet
+        while not watch_events.empty():
+            watch_events.get_nowait()
+        watch_pending_labels.clear()
+        watch_button.configure(text="Watch Folder")
+        watch_status_label.configure(text="")
+        return
+
+    folder = filedialog.askdirectory(title="Select the folder chip files are copied into")
+    if not folder:
+        return
+
+    from watch_folder import FolderWatcher
+
+    # With the duplicate check on, new files are hashed on the watcher's thread, not the Tk thread
+    content_index = get_content_index() if dedupe_content_switch.get() else None
+
+    def on_files(paths):
+        digests = content_index.digest_many(paths) if content_index is not None else None
+        watch_events.put(("files", (paths, digests)))
+
+    # The watcher calls back on its own thread; Tk is only touched from poll_watch_events
+    watcher = FolderWatcher(folder,
+                            on_files=on_files,
+                            on_quiet=lambda: watch_events.put(("quiet", None)),
+                            quiet_seconds=WATCH_QUIET_SECONDS)
+    try:
+        watcher.start()
+    except OSError as e:
+        logging.error(f"Failed to watch folder: {str(e)}")
+        messagebox.showerror("Error", f"Failed to watch folder: {str(e)}")
+        return
+
+    folder_watcher = watcher
+    watch_button.configure(text="Stop Watching")
+    watch_status_label.configure(text=f"Watching {os.path.basename(folder) or folder}")
+    root.after(200, poll_watch_events, watcher)
+
+# Function to move batches from the watcher thread into the GUI
+def poll_watch_events(watcher):
+    if folder_watcher is not watcher:
+        # Watching stopped or restarted on another folder
+        return
+    while True:
+        try:
+            kind, event = watch_events.get_nowait()
+        except queue.Empty:
+            break
+        if kind == "files":
+            paths, digests = event
+            added = generate_labels_data(paths, digests=digests)
+            watch_pending_labels.extend(label_entry for _file_name, label_entry in added)
+            watch_status_label.configure(text=f"Added {len(added)} labels from {len(paths)} new files")
+        elif kind == "quiet" and auto_pdf_switch.get() and watch_pending_labels:
+            if pdf_job is not None:
+                # Try again once the PDF being created now is finished
+                watch_events.put((kind, event))
+                break
+            # Only the labels that arrived since the last automatic PDF go into this batch
+            create_pdf(file_name=f"Watch {time.strftime('%Y-%m-%d %H%M%S')}", batch_labels=list(watch_pending_labels))
+            if pdf_job is not None:
+                watch_pending_labels.clear()
+    root.after(200, poll_watch_events, watcher)
+
 qr_window = None  # Initialize the global variable
 
 def add_qr_code_window():
@@ -850,10 +1184,9 @@ def add_qr_code_window():
 
     qr_window.protocol("WM_DELETE_WINDOW", on_close)
 
-import ctypes
-from sys import platform
-
 def get_scaling_factor():
+    import ctypes
+    from sys import platform
     try:
         # Ensure DPI awareness is set (requires Windows 8.1 or later)
         if platform == "win32":
@@ -870,10 +1203,6 @@ def get_scaling_factor():
         print(f"Error getting scaling factor: {e}")
         return 1.0  # Default to 1.0 if detection fails
     
-# Load the envelope icon image
-envelope_icon_path = resource_path('resources/envelope.png')  # Ensure the path to your envelope icon
-envelope_icon_image = ctk.CTkImage(light_image=Image.open(envelope_icon_path), size=(30, 30))
-
 # Function to open the support ticket window
 def open_support_ticket():
     def send_email_callback():
@@ -902,10 +1231,6 @@ def open_support_ticket():
     submit_button = ctk.CTkButton(ticket_window, text="Send", command=send_email_callback)
     submit_button.pack(pady=20)
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
 def send_email(subject, body_plain, body_html, to_email, from_email, password):
     """
     Send an email via an SMTP server with plain text and HTML formatting.
@@ -917,6 +1242,11 @@ def send_email(subject, body_plain, body_html, to_email, from_email, password):
     :param from_email: Sender's email address
     :param password: Sender's email account password
     """
+    # Loaded on first use so startup does not pay for the SMTP and email modules
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         # Create the email with both plain text and HTML content
         message = MIMEMultipart("alternative")
@@ -940,15 +1270,15 @@ def send_email(subject, body_plain, body_html, to_email, from_email, password):
         print(f"Error sending email: {e}")
         return False
 
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
 def handle_send_email(name_entry, email_entry, message_text, ticket_window):
     """
     Collect input from the GUI and send the email.
     """
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
     name = name_entry.get()
     email = email_entry.get()
     message = message_text.get("1.0", "end").strip()
@@ -1031,144 +1361,247 @@ def handle_send_email(name_entry, email_entry, message_text, ticket_window):
     else:
         messagebox.showerror("Error", "Failed to send email. Please try again.")
 
-
-# GUI Setup
-root = ctk.CTk()
-root.title("Label Maker")
-root.geometry("700x600")  # Increased the window width to accommodate both sides
-root.configure(bg="#3A3A3A")
-
 # Function to create and display a context menu with "Refresh" option
 def show_context_menu(event):
     context_menu = Menu(root, tearoff=0)  # Create a context menu using tkinter's Menu
     context_menu.add_command(label="Refresh", command=display_order_history)  # Add "Refresh" option
     context_menu.tk_popup(event.x_root, event.y_root)  # Display the menu at the cursor's position
 
-# Bind right-click event to the entire root window to show the context menu
-root.bind("<Button-3>", show_context_menu)
+# Function to open the webpage when the button is clicked
+def open_video_page():
+    import webbrowser
+    webbrowser.open("https://www.loom.com/share/35d9e373cdf5412d89e9d7f68ba0647c?sid=169d3286-3261-4917-b01b-9ffd6587446b")  # Replace with your actual webpage URL
+
+# Function to load the logo and icon images once the window is already on screen
+def load_gui_images(logo_label, support_button, video_button):
+    from PIL import Image
 
-root.iconbitmap(resource_path('resources/scribe-icon.ico'))
+    # CTkImage scales the images to the requested size itself
+    logo_image = Image.open(resource_path('resources/scribe-logo-final.webp'))
+    logo_ctk_image = ctk.CTkImage(light_image=logo_image, dark_image=logo_image, size=(258, 100))
+    logo_label.configure(image=logo_ctk_image)
 
-# Load the video icon image
-video_icon_path = resource_path('resources/video_icon.webp')  # Ensure the path to your video icon
-video_icon_image = ctk.CTkImage(light_image=Image.open(video_icon_path), size=(30, 30))
+    # Load the envelope icon image
+    envelope_icon_path = resource_path('resources/envelope.png')  # Ensure the path to your envelope icon
+    support_button.configure(image=ctk.CTkImage(light_image=Image.open(envelope_icon_path), size=(30, 30)))
 
-# Add the envelope icon button next to the video button
-envelope_button = ctk.CTkButton(root, 
-                                 image=envelope_icon_image, 
+    # Load the video icon image
+    video_icon_path = resource_path('resources/video_icon.webp')  # Ensure the path to your video icon
+    video_button.configure(image=ctk.CTkImage(light_image=Image.open(video_icon_path), size=(30, 30)))
+
+# Function to print how long each startup phase took against STARTUP_BUDGET_SECONDS
+def report_startup_timing(startup_marks):
+    previous = _STARTUP_T0
+    for phase, timestamp in startup_marks:
+        print(f"{phase:<28}{timestamp - previous:8.3f}s  (total {timestamp - _STARTUP_T0:.3f}s)")
+        previous = timestamp
+
+    first_frame = dict(startup_marks)["first frame"] - _STARTUP_T0
+    status = "within" if first_frame <= STARTUP_BUDGET_SECONDS else "OVER"
+    print(f"First frame after {first_frame:.3f}s, {status} the {STARTUP_BUDGET_SECONDS:.1f}s startup budget")
+
+# GUI Setup
+def main():
+    global root, canvas, scrollable_frame, history_label_frame
+    global envelope_files_list, letter_files_list, open_button, reset_button, vector_pdf_switch, resolution_button
+    global watch_button, auto_pdf_switch, watch_status_label, auto_color_switch, dedupe_content_switch
+    global file_check_label
+
+    # Set up logging to log errors to a file
+    logging.basicConfig(filename='file_processing_errors.log',
+                        level=logging.ERROR,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Waits for the shared history lock go to their own log in the local data folder
+    try:
+        lock_handler = logging.FileHandler(os.path.join(get_data_dir(), "history_lock.log"), delay=True)
+        lock_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        lock_log.addHandler(lock_handler)
+        lock_log.setLevel(logging.INFO)
+        lock_log.propagate = False
+    except OSError as e:
+        logging.error(f"Failed to open the history lock log: {str(e)}")
+
+    startup_timing = "--startup-timing" in sys.argv or os.environ.get("LABEL_MAKER_STARTUP_TIMING") == "1"
+    startup_marks = [("imports", time.perf_counter())]
+
+    # Set CustomTkinter appearance mode and color theme
+    ctk.set_appearance_mode("light")
+    ctk.set_default_color_theme("green")
+
+    root = ctk.CTk()
+    root.title("Label Maker")
+    root.geometry("700x600")  # Increased the window width to accommodate both sides
+    root.configure(bg="#3A3A3A")
+
+    # Bind right-click event to the entire root window to show the context menu
+    root.bind("<Button-3>", show_context_menu)
+
+    root.iconbitmap(resource_path('resources/scribe-icon.ico'))
+
+    # Add the envelope icon button next to the video button (its icon is loaded after the first frame)
+    support_button = ctk.CTkButton(root, 
+                                     text="", 
+                                     width=40, height=40, 
+                                     command=open_support_ticket, 
+                                     fg_color="transparent", 
+                                     hover_color="#f0f0f0")
+    support_button.place(x=590, y=10)  # Adjust x, y coordinates relative to the video button
+
+    # Add the video icon button at the position where the blue box is
+    video_button = ctk.CTkButton(root, 
                                  text="", 
                                  width=40, height=40, 
-                                 command=open_support_ticket, 
+                                 command=open_video_page, 
                                  fg_color="transparent", 
                                  hover_color="#f0f0f0")
-envelope_button.place(x=590, y=10)  # Adjust x, y coordinates relative to the video button
+    video_button.place(x=640, y=10)  # Adjust x, y coordinates to position where the blue box is
 
-# Function to open the webpage when the button is clicked
-import webbrowser
-def open_video_page():
-    webbrowser.open("https://www.loom.com/share/35d9e373cdf5412d89e9d7f68ba0647c?sid=169d3286-3261-4917-b01b-9ffd6587446b")  # Replace with your actual webpage URL
 
-# Add the video icon button at the position where the blue box is
-video_button = ctk.CTkButton(root, 
-                             image=video_icon_image, 
-                             text="", 
-                             width=40, height=40, 
-                             command=open_video_page, 
-                             fg_color="transparent", 
-                             hover_color="#f0f0f0")
-video_button.place(x=640, y=10)  # Adjust x, y coordinates to position where the blue box is
+    # Reserve the logo's space now; the image is loaded after the first frame
+    logo_label = ctk.CTkLabel(root, text="", width=258, height=100)
+    logo_label.pack(pady=10)
+
+    # Left side scrollable frame for main content
+    left_frame = ctk.CTkFrame(root, fg_color="#3A3A3A", corner_radius=15)
+    left_frame.pack(side="left", fill="both", expand=True, padx=(10, 5), pady=10)
+
+    # Create an inner frame to hold the canvas and leave space for the corner radius
+    inner_frame = ctk.CTkFrame(left_frame, fg_color="#3A3A3A", corner_radius=15)
+    inner_frame.pack(expand=True, fill="both", padx=10, pady=10)
+
+    canvas = ctk.CTkCanvas(inner_frame, bg="#3A3A3A", highlightthickness=0)
+    scrollbar = ctk.CTkScrollbar(inner_frame, orientation="vertical", command=canvas.yview)
+    scrollable_frame = ctk.CTkFrame(canvas, fg_color="#3A3A3A", corner_radius=15)
+
+    scrollable_frame.bind(
+        "<Configure>",
+        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    )
+
+    # Get scaling factor
+    scaling_factor = get_scaling_factor()
+
+    # Determine width based on scaling factor
+    if scaling_factor >= 1.5:  # 150% scaling
+        canvas_width = 540
+    elif scaling_factor >= 1.25:  # 125% scaling
+        canvas_width = 450
+    else:  # 100% scaling or default
+        canvas_width = 380
+
+    # Apply the calculated width to the canvas
+    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw", width=canvas_width)
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    canvas.bind_all("<MouseWheel>", on_mousewheel)
+    canvas.bind_all("<Button-4>", on_mousewheel_mac)
+    canvas.bind_all("<Button-5>", on_mousewheel_mac)
+
+    canvas.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
 
+    # Right side frame for order history
+    right_frame = ctk.CTkFrame(root, fg_color="#2E2E2E", corner_radius=15, width=250)
+    right_frame.pack(side="right", fill="y", padx=(5, 10), pady=10)
 
-from PIL import Image
-logo_image = Image.open(resource_path('resources/scribe-logo-final.webp'))
-logo_image = logo_image.resize((258, 100), Image.Resampling.LANCZOS)
+    history_label_frame = ctk.CTkScrollableFrame(right_frame, width=230, fg_color="#2E2E2E", height=500)
+    history_label_frame.pack(pady=10, padx=10, fill="both", expand=True)
 
-logo_ctk_image = ctk.CTkImage(light_image=logo_image, dark_image=logo_image, size=(258, 100))
-logo_label = ctk.CTkLabel(root, image=logo_ctk_image, text="")
-logo_label.pack(pady=10)
+    # Add widgets to left scrollable frame
+    instruction = ctk.CTkLabel(scrollable_frame, text="Select files to generate labels", font=("Helvetica", 16), text_color="white")
+    instruction.pack(pady=1, padx=20, expand=False)
 
-# Left side scrollable frame for main content
-left_frame = ctk.CTkFrame(root, fg_color="#3A3A3A", corner_radius=15)
-left_frame.pack(side="left", fill="both", expand=True, padx=(10, 5), pady=10)
+    # Add a new label for the file format below the instruction label
+    file_format_example = ctk.CTkLabel(scrollable_frame, text="Examples: Chris LaVigne T1 Copy 1 Envelopes-1-167.bin\n" + 
+                                                                    "Chris LaVigne T1 Copy 2 Letters-1-167.bin\n" +
+                                                                        "Chris LaVigne T1 Envelopes-1-167.bin", 
+                                     font=("Helvetica", 12), text_color="gray")
+    file_format_example.pack(pady=1, padx=20, expand=False)
 
-# Create an inner frame to hold the canvas and leave space for the corner radius
-inner_frame = ctk.CTkFrame(left_frame, fg_color="#3A3A3A", corner_radius=15)
-inner_frame.pack(expand=True, fill="both", padx=10, pady=10)
+    envelope_button = ctk.CTkButton(scrollable_frame, text="Select Envelope Chip Files", command=select_envelope_files)
+    envelope_button.pack(pady=10, padx=20, fill="x", expand=True)
 
-canvas = ctk.CTkCanvas(inner_frame, bg="#3A3A3A", highlightthickness=0)
-scrollbar = ctk.CTkScrollbar(inner_frame, orientation="vertical", command=canvas.yview)
-scrollable_frame = ctk.CTkFrame(canvas, fg_color="#3A3A3A", corner_radius=15)
+    letter_button = ctk.CTkButton(scrollable_frame, text="Select Letter Chip Files", command=select_letter_files)
+    letter_button.pack(pady=10, padx=20, fill="x", expand=True)
 
-scrollable_frame.bind(
-    "<Configure>",
-    lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-)
+    # Progress of the background check of selected files
+    file_check_label = ctk.CTkLabel(scrollable_frame, text="", font=("Helvetica", 12), text_color="gray")
+    file_check_label.pack(pady=1, padx=20)
 
-# Get scaling factor
-scaling_factor = get_scaling_factor()
+    # New orders get a past or automatic color instead of a color picker per order
+    auto_color_switch = ctk.CTkSwitch(scrollable_frame, text="Assign colors automatically", text_color="white")
+    auto_color_switch.select()
+    auto_color_switch.pack(pady=5, padx=20, anchor="w")
 
-# Determine width based on scaling factor
-if scaling_factor >= 1.5:  # 150% scaling
-    canvas_width = 540
-elif scaling_factor >= 1.25:  # 125% scaling
-    canvas_width = 450
-else:  # 100% scaling or default
-    canvas_width = 380
+    dedupe_content_switch = ctk.CTkSwitch(scrollable_frame, text="Skip copies of the same chip file", text_color="white")
+    dedupe_content_switch.pack(pady=5, padx=20, anchor="w")
 
-# Apply the calculated width to the canvas
-canvas.create_window((0, 0), window=scrollable_frame, anchor="nw", width=canvas_width)
-canvas.configure(yscrollcommand=scrollbar.set)
+    review_colors_button = ctk.CTkButton(scrollable_frame, text="Review Colors", command=review_order_colors, fg_color="#6c757d", hover_color="#adb5bd")
+    review_colors_button.pack(pady=10, padx=20, fill="x")
 
-canvas.bind_all("<MouseWheel>", on_mousewheel)
-canvas.bind_all("<Button-4>", on_mousewheel_mac)
-canvas.bind_all("<Button-5>", on_mousewheel_mac)
+    add_qr_button = ctk.CTkButton(scrollable_frame, text="Add QR Code", command=add_qr_code_window, fg_color="#6c757d", hover_color="#adb5bd")
+    add_qr_button.pack(pady=10, padx=20, fill="x")
 
-canvas.pack(side="left", fill="both", expand=True)
-scrollbar.pack(side="right", fill="y")
+    # Watch a folder for chip files instead of selecting them by hand
+    watch_button = ctk.CTkButton(scrollable_frame, text="Watch Folder", command=toggle_watch_folder, fg_color="#6c757d", hover_color="#adb5bd")
+    watch_button.pack(pady=10, padx=20, fill="x")
 
-# Right side frame for order history
-right_frame = ctk.CTkFrame(root, fg_color="#2E2E2E", corner_radius=15, width=250)
-right_frame.pack(side="right", fill="y", padx=(5, 10), pady=10)
+    auto_pdf_switch = ctk.CTkSwitch(scrollable_frame, text=f"Create PDF after {WATCH_QUIET_SECONDS:.0f} s without new files", text_color="white")
+    auto_pdf_switch.pack(pady=5, padx=20, anchor="w")
 
-history_label_frame = ctk.CTkScrollableFrame(right_frame, width=230, fg_color="#2E2E2E", height=500)
-history_label_frame.pack(pady=10, padx=10, fill="both", expand=True)
+    watch_status_label = ctk.CTkLabel(scrollable_frame, text="", font=("Helvetica", 12), text_color="gray")
+    watch_status_label.pack(pady=1, padx=20)
 
-# Add widgets to left scrollable frame
-instruction = ctk.CTkLabel(scrollable_frame, text="Select files to generate labels", font=("Helvetica", 16), text_color="white")
-instruction.pack(pady=1, padx=20, expand=False)
+    create_button = ctk.CTkButton(scrollable_frame, text="Create PDF", command=create_pdf, fg_color="#133d8e", hover_color="#266cc3")
+    create_button.pack(pady=10, padx=20, fill="x", expand=True)
 
-# Add a new label for the file format below the instruction label
-file_format_example = ctk.CTkLabel(scrollable_frame, text="Examples: Chris LaVigne T1 Copy 1 Envelopes-1-167.bin\n" + 
-                                                                "Chris LaVigne T1 Copy 2 Letters-1-167.bin\n" +
-                                                                    "Chris LaVigne T1 Envelopes-1-167.bin", 
-                                 font=("Helvetica", 12), text_color="gray")
-file_format_example.pack(pady=1, padx=20, expand=False)
+    preview_button = ctk.CTkButton(scrollable_frame, text="Preview", command=open_preview_window, fg_color="#6c757d", hover_color="#adb5bd")
+    preview_button.pack(pady=(0, 10), padx=20, fill="x")
 
-envelope_button = ctk.CTkButton(scrollable_frame, text="Select Envelope Chip Files", command=select_envelope_files)
-envelope_button.pack(pady=10, padx=20, fill="x", expand=True)
+    # Switch between the 300 DPI image backend and the native vector PDF backend
+    vector_pdf_switch = ctk.CTkSwitch(scrollable_frame, text="Vector PDF (smaller, faster)", text_color="white")
+    vector_pdf_switch.pack(pady=5, padx=20, anchor="w")
 
-letter_button = ctk.CTkButton(scrollable_frame, text="Select Letter Chip Files", command=select_letter_files)
-letter_button.pack(pady=10, padx=20, fill="x", expand=True)
+    # Raster resolution; draft pages are about four times cheaper to render and store
+    resolution_button = ctk.CTkSegmentedButton(scrollable_frame, values=list(RESOLUTION_CHOICES))
+    resolution_button.set("Standard 300 DPI")
+    resolution_button.pack(pady=5, padx=20, fill="x")
 
-add_qr_button = ctk.CTkButton(scrollable_frame, text="Add QR Code", command=add_qr_code_window, fg_color="#6c757d", hover_color="#adb5bd")
-add_qr_button.pack(pady=10, padx=20, fill="x")
+    reset_button = ctk.CTkButton(scrollable_frame, text="Reset", command=reset_data, width=100, fg_color="#8e1313", hover_color="#c32626")
+    reset_button.pack(pady=15, padx=20)
 
-create_button = ctk.CTkButton(scrollable_frame, text="Create PDF", command=create_pdf, fg_color="#133d8e", hover_color="#266cc3")
-create_button.pack(pady=10, padx=20, fill="x", expand=True)
+    open_button = ctk.CTkButton(scrollable_frame, text="Open Created PDF File", width=300, fg_color="#133d8e", hover_color="#266cc3")
+    open_button.pack_forget()
+
+    # Only the visible rows of these lists are drawn, so thousands of files stay responsive
+    envelope_files_list = VirtualFileList(scrollable_frame, "Selected Envelope Files")
+    envelope_files_list.pack(pady=10, padx=20, fill="x", side="top")
+
+    letter_files_list = VirtualFileList(scrollable_frame, "Selected Letter Files")
+    letter_files_list.pack(pady=10, padx=20, fill="x", side="top")
 
-reset_button = ctk.CTkButton(scrollable_frame, text="Reset", command=reset_data, width=100, fg_color="#8e1313", hover_color="#c32626")
-reset_button.pack(pady=15, padx=20)
+    startup_marks.append(("window built", time.perf_counter()))
+
+    def finish_startup():
+        startup_marks.append(("first frame", time.perf_counter()))
+        load_gui_images(logo_label, support_button, video_button)
+
+        # Display the order history on the right side
+        display_order_history()
+        startup_marks.append(("assets and history loaded", time.perf_counter()))
 
-open_button = ctk.CTkButton(scrollable_frame, text="Open Created PDF File", width=300, fg_color="#133d8e", hover_color="#266cc3")
-open_button.pack_forget()
+        if startup_timing:
+            report_startup_timing(startup_marks)
+            root.destroy()
 
-envelope_label = ctk.CTkLabel(scrollable_frame, text="Selected Envelope Files:\n", font=("Helvetica", 12), text_color="white", anchor="w", justify="left")
-envelope_label.pack(pady=10, padx=20, fill="x", side="top")
+    # Idle callbacks run in order, so this runs after the first frame has been drawn
+    root.after_idle(lambda: root.after(0, finish_startup))
 
-letter_label = ctk.CTkLabel(scrollable_frame, text="Selected Letter Files:\n", font=("Helvetica", 12), text_color="white", anchor="w", justify="left")
-letter_label.pack(pady=10, padx=20, fill="x", side="top")
+    root.mainloop()
 
-# Display the order history on the right side
-display_order_history()
 
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    # Required so PDF render worker processes start correctly from the PyInstaller executable
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,119 @@
+"""
+Table-driven chip file name parser.
+
+A chip file name is "<order name> <type keyword> <first>-<last>.bin", e.g.
+"Chris LaVigne T1 Envelopes-1-167.bin". The type keywords come from a table
+of NamingRule entries checked in order, and the record range uses one
+precompiled pattern. Parsing never prompts: names without a keyword come
+back with status STATUS_UNKNOWN_TYPE so the caller decides what to do with
+them (ask the user, apply a default or skip them).
+"""
+import os
+import re
+from collections import namedtuple
+
+STATUS_OK = "ok"
+STATUS_UNKNOWN_TYPE = "unknown_type"
+
+# keyword: text searched for in the file name; card_envelope: value written on the label;
+# type_name: name used by the type prompt and --default-type
+NamingRule = namedtuple("NamingRule", ["keyword", "card_envelope", "type_name"])
+
+DEFAULT_RULES = (
+    NamingRule("Envelopes", "Envelope", "Envelopes"),
+    NamingRule("Letters", "Card", "Letters"),
+)
+
+DEFAULT_RANGE_PATTERN = r'(\d+)-(\d+)'
+
+# One parsed file name; card_envelope is None while the status is STATUS_UNKNOWN_TYPE
+ChipRecord = namedtuple("ChipRecord", ["status", "file_name", "order_name", "card_envelope", "num_records"])
+
+
+def _strip_extension(file_name):
+    """ os.path.splitext(file_name)[0] for a base name, without its per-call overhead. """
+    dot = file_name.rfind('.')
+    # A name made only of leading dots before the last dot (".bin", "..bin") has no extension
+    if dot > 0 and (file_name[0] != '.' or file_name[:dot].lstrip('.')):
+        return file_name[:dot]
+    return file_name
+
+
+class ChipFileParser:
+    """
+    Parser for chip file names.
+
+    :param rules: NamingRule entries; the first rule whose keyword occurs in the name wins.
+    :param range_pattern: Regex with two groups, the first and last record number.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, range_pattern=DEFAULT_RANGE_PATTERN):
+        self.rules = tuple(NamingRule(*rule) for rule in rules)
+        self._range_search = re.compile(range_pattern).search
+        self._types = {rule.type_name: rule.card_envelope for rule in self.rules}
+
+    def card_envelope_for(self, type_name):
+        """ Return the label value for a type name such as "Envelopes", or None if unknown. """
+        return self._types.get(type_name)
+
+    def parse_name(self, file_name):
+        """ Parse a file's base name into a ChipRecord. """
+        base_name = _strip_extension(file_name)  # Remove the extension (e.g., ".bin")
+
+        for keyword, card_envelope, _type_name in self.rules:
+            start = base_name.find(keyword)
+            if start < 0:
+                continue
+            # The order name comes before the keyword, the range between it and any repeat of it
+            order_name = base_name[:start].strip()
+            rest_start = start + len(keyword)
+            rest_end = base_name.find(keyword, rest_start)
+            rest = base_name[rest_start:rest_end if rest_end >= 0 else None].strip()
+            status = STATUS_OK
+            break
+        else:
+            # Without a keyword the entire base name is the order name
+            order_name = base_name.strip()
+            card_envelope = None
+            rest = ''
+            status = STATUS_UNKNOWN_TYPE
+
+        # Now try to extract the range from rest or base_name
+        match = self._range_search(rest if rest else base_name)
+        if match:
+            num_records = int(match.group(2)) - int(match.group(1)) + 1
+            # Remove the range from order_name if it was in order_name
+            if not rest:
+                order_name = order_name[:match.start()].strip()
+        else:
+            num_records = None
+
+        return ChipRecord(status, file_name, order_name, card_envelope, num_records)
+
+    def parse_many(self, paths):
+        """ Parse the base names of many paths; pure, no file system access. """
+        parse_name = self.parse_name
+        if os.sep == '/' and not os.altsep:
+            # Same as os.path.basename on POSIX, as a plain string operation
+            return [parse_name(path[path.rfind('/') + 1:]) for path in paths]
+        basename = os.path.basename
+        return [parse_name(basename(path)) for path in paths]
+
+    def resolve_type(self, record, type_name):
+        """ Return ``record`` with its type set from a type name, or None if the type is unknown. """
+        card_envelope = self.card_envelope_for(type_name)
+        if card_envelope is None:
+            return None
+        return record._replace(status=STATUS_OK, card_envelope=card_envelope)
+
+
+default_parser = ChipFileParser()
+
+
+def parse_name(file_name):
+    return default_parser.parse_name(file_name)
+
+
+def parse_many(paths):
+    """ Parse many chip file paths with the default naming rules. """
+    return default_parser.parse_many(paths)
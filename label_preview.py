@@ -0,0 +1,86 @@
+"""
+Low-resolution page previews for the GUI.
+
+A preview page is drawn on demand, only when it is viewed, by the raster
+renderer's layout code at screen resolution, so no print-resolution PDF has to be
+written to check a batch. Previews are cached under a hash of the page's
+labels (including their colors) and QR URLs, so a page is drawn again only
+after something on it changed.
+"""
+import threading
+from collections import OrderedDict
+
+import page_cache
+from label_render import (LABELS_PER_PAGE, PAGE_HEIGHT, PAGE_WIDTH, POINTS_PER_INCH, layout_signature,
+                          render_page_preview)
+
+
+def page_count(labels_data):
+    return -(-len(labels_data) // LABELS_PER_PAGE)
+
+
+def page_slice(labels_data, page_index):
+    """ The labels printed on page ``page_index`` (0-based). """
+    return labels_data[page_index * LABELS_PER_PAGE:(page_index + 1) * LABELS_PER_PAGE]
+
+
+def dpi_to_fit(width, height):
+    """ Resolution at which a page fits in a width x height pixel area. """
+    return min(width / PAGE_WIDTH, height / PAGE_HEIGHT) * POINTS_PER_INCH
+
+
+class PreviewCache:
+    """
+    LRU cache of rendered preview pages.
+
+    :param max_entries: Number of preview images kept; the least recently viewed are dropped first.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def page_key(self, page_labels, qr_codes, dpi):
+        """ Content hash of one preview page; it changes whenever anything drawn on the page changes. """
+        page_qr_codes = {label["order_name"]: qr_codes[label["order_name"]]
+                         for label in page_labels if label["order_name"] in qr_codes}
+        return page_cache.page_key(layout_signature(), "preview", round(dpi, 2), page_labels, page_qr_codes)
+
+    def get_page(self, page_labels, qr_codes, dpi):
+        """
+        Return the preview image of one page at ``dpi``, drawing it only if it is not cached.
+
+        :param page_labels: The page's labels with their colors applied, as they would be printed.
+        :param qr_codes: Dictionary mapping order_name to its QR code URL.
+        """
+        key = self.page_key(page_labels, qr_codes, dpi)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+
+        image = render_page_preview(page_labels, qr_codes, dpi)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = image
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by every preview window of the session
+default_cache = PreviewCache()
@@ -0,0 +1,786 @@
+"""
+Page layout and PDF rendering for the 2x6 label sheets.
+
+Two backends draw the same layout:
+
+- ``"raster"``: every page is drawn into a Pillow image and the images are
+  saved as a PDF (the original rendering path). With ``streaming=True`` each
+  page is encoded and written as soon as it is drawn, so memory use stays at
+  about one page however many labels are printed.
+- ``"vector"``: every page is written as native PDF text, rectangles, lines and
+  QR modules, with a subset of the label font embedded in the file.
+
+The layout is defined in points. Raster pages are drawn at a resolution
+profile, draft (150 DPI), standard (300 DPI, the default) or high (600 DPI),
+with the same geometry at each.
+
+Streamed raster pages are stored losslessly with Flate, as 1-bit or 8-bit
+gray, an exact palette or RGB, whichever is the smallest that reproduces the
+rendered page exactly (see encode_page_image). The non-streaming path saves
+the page images with Pillow as before.
+
+When page_cache has a default cache configured, every encoded page is stored
+under a hash of its content, and re-creating a PDF only renders the pages
+that changed since.
+
+The PDF is written to ``<output>.part`` and renamed into place once complete,
+so a failed or cancelled run never leaves a partial file at the output path.
+
+With ``append=True`` the labels are added to an existing PDF as an
+incremental update instead: they first fill the empty slots of its last page
+(when it was written by this module, which records the slots used on every
+page), then go on new pages. The pages already in the file are not decoded
+or rendered again.
+"""
+import collections
+import concurrent.futures
+import functools
+import logging
+import math
+import os
+import zlib
+
+import PIL
+from PIL import Image, ImageChops, ImageColor, ImageDraw
+
+import font_cache
+import page_cache
+import qr_cache
+from app_paths import resource_path
+from pdf_update import ExistingDocument, PDFUpdate
+from pdf_writer import FontSubset, Name, PDFWriter, format_number
+
+# The layout is in points (1/72 inch); raster pages convert it to pixels at the chosen resolution
+POINTS_PER_INCH = 72
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # 8.5 x 11 inches
+MARGIN = 19.2  # Margin around the label grid
+LABEL_WIDTH, LABEL_HEIGHT = 264, 108  # Label dimensions for 2x6 grid
+GAP_X, GAP_Y = 36, 19.2  # Gaps between labels horizontally and vertically
+
+# Number of rows and columns for the 2x6 layout
+NUM_ROWS = 6
+NUM_COLS = 2
+LABELS_PER_PAGE = NUM_ROWS * NUM_COLS
+
+FONT_PATH = 'resources/Arial_Bold.ttf'
+FONT_SIZE_LARGE = 14.4
+FONT_SIZE_MEDIUM = 12
+QR_SIZE = 60  # QR code size
+QR_RIGHT, QR_TOP = 4.8, 45.6  # QR code inset from the label's right edge and top
+
+# Label box and the divider line between "Chip #" and "# of Records", relative to the label
+BOX_LINE_WIDTH = 0.72
+DIVIDER_X, DIVIDER_TOP, DIVIDER_BOTTOM = 78, 48, 84
+DIVIDER_LINE_WIDTH = 1.2
+
+# Raster resolutions: draft proofs cost about a quarter of standard to render and store
+RESOLUTION_PROFILES = {"draft": 150, "standard": 300, "high": 600}
+DEFAULT_RESOLUTION = "standard"
+
+# Vector content is laid out on a 1/300 inch grid (a page transform maps it onto points),
+# which keeps the numbers in the content streams whole
+VECTOR_DPI = 300
+
+BACKENDS = ("raster", "vector")
+
+# Page dictionary entry recording how many label slots a page uses, so an append can fill the rest
+SLOTS_KEY = "LabelSlots"
+
+# Bump whenever a change to the drawing or encoding code changes the bytes of a page,
+# so pages cached by an older version are not reused
+RENDER_VERSION = 3
+
+# zlib level for raster pages; levels 1-3 are only a little faster but make label pages about 50% larger
+FLATE_LEVEL = 6
+
+
+class RenderCancelled(Exception):
+    """ Raised by generate_labels_pdf when its cancel event is set. """
+
+
+def get_font_path():
+    """ Return the label font path, raising if the font file is missing. """
+    font_path = resource_path(FONT_PATH)
+    if not os.path.exists(font_path):
+        raise FileNotFoundError(f"Font file not found at {font_path}")
+    return font_path
+
+
+def to_pixels(points, dpi):
+    """ Convert a layout length or position in points to whole pixels at ``dpi``. """
+    return round(points * dpi / POINTS_PER_INCH)
+
+
+def resolution_dpi(resolution):
+    """ Return the DPI of a resolution profile name ("draft", "standard" or "high"). """
+    try:
+        return RESOLUTION_PROFILES[resolution]
+    except KeyError:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of "
+                         f"{', '.join(RESOLUTION_PROFILES)}") from None
+
+
+def label_positions():
+    """ Calculate label positions column-first, as (x_start, y_start) tuples in points. """
+    positions = []
+    for col in range(NUM_COLS):
+        for row in range(NUM_ROWS):
+            x_start = MARGIN + col * (LABEL_WIDTH + GAP_X)
+            y_start = MARGIN + row * (LABEL_HEIGHT + GAP_Y)
+            positions.append((x_start, y_start))
+    return positions
+
+
+def paginate(labels_data):
+    """ Split labels_data into the lists of labels printed on each page. """
+    return [labels_data[start:start + LABELS_PER_PAGE]
+            for start in range(0, len(labels_data), LABELS_PER_PAGE)]
+
+
+def normalize_color(text_color):
+    """ Ensure a label color is in a format PIL can use ('#' prefixed hex or a color name). """
+    if isinstance(text_color, str):
+        if not text_color.startswith('#') and len(text_color) == 6:
+            text_color = '#' + text_color  # Add '#' if missing
+    return text_color
+
+
+def label_fields(label):
+    """
+    List the variable, colored fields of a label as (x offset, y offset, text, font size), in points.
+
+    Offsets are relative to the label's top-left corner; the black captions are
+    part of the label template instead.
+    """
+    fields = [
+        (7.2, 21.6, label["order_name"], FONT_SIZE_LARGE),
+        (7.2, 63.6, label["batch_chip"], FONT_SIZE_LARGE),
+    ]
+    num_records = label.get('num_records', None)
+    if num_records is not None:
+        fields.append((115.2, 63.6, str(num_records), FONT_SIZE_MEDIUM))
+    fields.append((40.8, 86.4, label["card_envelope"], FONT_SIZE_LARGE))
+    return fields
+
+
+def label_captions(has_records):
+    """ List the static black captions of a label as (x offset, y offset, text), in points. """
+    captions = [(4.8, 4.8, "Order Name & Number:"), (4.8, 48, "Chip #:")]
+    if has_records:
+        captions.append((96, 48, "# of Records:"))
+    captions.append((4.8, 86.4, "Type:"))
+    return captions
+
+
+@functools.lru_cache(maxsize=16)
+def render_label_template(font_medium, has_records, dpi):
+    """
+    Draw the static chrome of one label (box, divider line and black captions) once.
+
+    The white tile covers the label box exactly, so pasting it at a label
+    position gives the same pixels as drawing the chrome onto the page.
+
+    :param font_medium: PIL font used for the captions.
+    :param has_records: Whether the "# of Records:" caption is shown.
+    :param dpi: Resolution the tile is drawn at.
+    """
+    width, height = to_pixels(LABEL_WIDTH, dpi), to_pixels(LABEL_HEIGHT, dpi)
+    template = Image.new("RGB", (width + 1, height + 1), "white")
+    draw = ImageDraw.Draw(template)
+
+    # Draw label box
+    draw.rectangle([0, 0, width, height], outline="black", width=max(1, to_pixels(BOX_LINE_WIDTH, dpi)))
+
+    # Draw the vertical line in the middle of the label
+    x_line = to_pixels(DIVIDER_X, dpi)
+    draw.line([(x_line, to_pixels(DIVIDER_TOP, dpi)), (x_line, to_pixels(DIVIDER_BOTTOM, dpi))], fill="black",
+              width=max(1, to_pixels(DIVIDER_LINE_WIDTH, dpi)))
+
+    for x, y, text in label_captions(has_records):
+        draw.text((to_pixels(x, dpi), to_pixels(y, dpi)), text, fill='black', font=font_medium)
+    return template
+
+
+def render_page_image(page_labels, qr_codes, font_large, font_medium, first_slot=0, dpi=300):
+    """
+    Draw one page of labels into an RGB image.
+
+    :param page_labels: The labels printed on this page (at most LABELS_PER_PAGE).
+    :param qr_codes: Dictionary mapping order_name to its QR code URL.
+    :param font_large: PIL font used for the colored values.
+    :param font_medium: PIL font used for the captions.
+    :param first_slot: Slot (in label_positions order) of the first label.
+    :param dpi: Resolution of the image; the fonts must be loaded for the same
+                resolution, see _load_raster_fonts.
+    """
+    # Create a blank canvas for the page
+    page = Image.new("RGB", (to_pixels(PAGE_WIDTH, dpi), to_pixels(PAGE_HEIGHT, dpi)), "white")
+    positions = label_positions()
+    fonts = {FONT_SIZE_LARGE: font_large, FONT_SIZE_MEDIUM: font_medium}
+    qr_size = to_pixels(QR_SIZE, dpi)
+
+    for i, label in enumerate(page_labels, first_slot):
+        x_start, y_start = positions[i]
+        x_end = x_start + LABEL_WIDTH
+
+        # Stamp the pre-rendered box, divider and captions
+        has_records = label.get('num_records', None) is not None
+        page.paste(render_label_template(font_medium, has_records, dpi),
+                   (to_pixels(x_start, dpi), to_pixels(y_start, dpi)))
+
+        # Draw the colored values onto the label from the rendered-text cache
+        text_color = normalize_color(label.get('color', "black"))
+        for x, y, text, size in label_fields(label):
+            font_cache.draw_text(page, (to_pixels(x_start + x, dpi), to_pixels(y_start + y, dpi)), text,
+                                 fonts[size], text_color)
+
+        # Add QR code if it exists for the order
+        order_name = label["order_name"]
+        if order_name in qr_codes:
+            qr_img = qr_cache.get_default_cache().get_image(qr_codes[order_name], qr_size)
+            # Position near top-right of label
+            qr_position = (to_pixels(x_end - QR_SIZE - QR_RIGHT, dpi), to_pixels(y_start + QR_TOP, dpi))
+            page.paste(qr_img, qr_position)
+
+    return page
+
+
+def render_page_preview(page_labels, qr_codes, dpi):
+    """
+    Draw one page at screen resolution (e.g. 72 DPI) with the raster layout code.
+
+    :param page_labels: The labels printed on this page (at most LABELS_PER_PAGE).
+    :param qr_codes: Dictionary mapping order_name to its QR code URL.
+    :param dpi: Resolution of the preview.
+    """
+    font_large, font_medium = _load_raster_fonts(dpi)
+    return render_page_image(page_labels, qr_codes, font_large, font_medium, dpi=dpi)
+
+
+def _pdf_color(color, operator):
+    """ Convert a label color into a PDF fill/stroke color operator. """
+    r, g, b = ImageColor.getrgb(normalize_color(color))[:3]
+    return b"%s %s %s %s" % (format_number(r / 255).encode(), format_number(g / 255).encode(),
+                             format_number(b / 255).encode(), operator)
+
+
+def _grid(points):
+    """ Convert points to the 1/300 inch units of vector content streams. """
+    return to_pixels(points, VECTOR_DPI)
+
+
+def _pdf_text(subset, x, y, text, size, color):
+    """ Show text with its ascender line at grid unit (x, y), matching PIL's default anchor. """
+    font = subset.font
+    baseline = y + math.ceil(font.ascender * size / font.units_per_em)
+    return b"BT %s /F1 %d Tf 1 0 0 -1 %s %s Tm %s Tj ET" % (
+        _pdf_color(color, b"rg"), size, format_number(x).encode(), format_number(baseline).encode(),
+        subset.encode(text))
+
+
+def _pdf_qr(url, x, y, qr_size):
+    """ Draw the dark QR modules as one filled path of row runs. """
+    modules = qr_cache.get_default_cache().get_matrix(url)  # includes the quiet-zone border
+    module_size = qr_size / len(modules)
+    rects = []
+    for row_index, row in enumerate(modules):
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            run_start = col
+            while col < len(row) and row[col]:
+                col += 1
+            rects.append(b"%s %s %s %s re" % (
+                format_number(x + run_start * module_size).encode(),
+                format_number(y + row_index * module_size).encode(),
+                format_number((col - run_start) * module_size).encode(),
+                format_number(module_size).encode()))
+    return b"0 g\n" + b"\n".join(rects) + b"\nf"
+
+
+def _template_name(has_records):
+    return "LabelTpl1" if has_records else "LabelTpl0"
+
+
+def render_label_template_vector(subset, has_records):
+    """
+    Build the content of the form XObject holding a label's static chrome,
+    in label-relative grid units.
+
+    :param subset: FontSubset collecting the glyphs used by the document.
+    :param has_records: Whether the "# of Records:" caption is shown.
+    """
+    box_line, divider_line = _grid(BOX_LINE_WIDTH), _grid(DIVIDER_LINE_WIDTH)
+    inset = format_number(box_line / 2).encode()
+    x_line = format_number(_grid(DIVIDER_X) + 0.5).encode()
+    ops = [
+        # Label box and vertical line, centred on the same pixels PIL fills at 300 DPI
+        b"0 G %d w %s %s %d %d re S" % (box_line, inset, inset, _grid(LABEL_WIDTH) + 1 - box_line,
+                                        _grid(LABEL_HEIGHT) + 1 - box_line),
+        b"%d w %s %d m %s %d l S" % (divider_line, x_line, _grid(DIVIDER_TOP), x_line, _grid(DIVIDER_BOTTOM) + 1),
+    ]
+    for x, y, text in label_captions(has_records):
+        ops.append(_pdf_text(subset, _grid(x), _grid(y), text, _grid(FONT_SIZE_MEDIUM), 'black'))
+    return b"\n".join(ops)
+
+
+def write_label_templates(writer, subset, font_ref):
+    """
+    Write both label template form XObjects and return the XObject resource dictionary.
+    """
+    resources = {}
+    for has_records in (False, True):
+        form = {
+            "Type": Name("XObject"),
+            "Subtype": Name("Form"),
+            "BBox": [0, 0, _grid(LABEL_WIDTH) + 1, _grid(LABEL_HEIGHT) + 1],
+            "Resources": {"Font": {"F1": font_ref}},
+        }
+        content = render_label_template_vector(subset, has_records)
+        resources[_template_name(has_records)] = writer.add_stream(form, content, compress=True)
+    return resources
+
+
+def render_page_vector(page_labels, qr_codes, subset, first_slot=0):
+    """
+    Build the content stream for one page of labels as PDF vector operators.
+
+    Coordinates are on the 1/300 inch grid, the pixel positions of a standard
+    resolution raster page; a page-level transform maps them onto the 612x792
+    point page. The static chrome of each label is drawn by the template forms
+    from write_label_templates.
+
+    :param page_labels: The labels printed on this page (at most LABELS_PER_PAGE).
+    :param qr_codes: Dictionary mapping order_name to its QR code URL.
+    :param subset: FontSubset collecting the glyphs used by the document.
+    :param first_slot: Slot (in label_positions order) of the first label.
+    """
+    scale = format_number(POINTS_PER_INCH / VECTOR_DPI).encode()
+    ops = [b"q %s 0 0 -%s 0 %s cm" % (scale, scale, format_number(PAGE_HEIGHT).encode())]
+    positions = label_positions()
+
+    for i, label in enumerate(page_labels, first_slot):
+        x_start, y_start = positions[i]
+        x_end = x_start + LABEL_WIDTH
+
+        # Stamp the box, divider and captions
+        has_records = label.get('num_records', None) is not None
+        ops.append(b"q 1 0 0 1 %d %d cm /%s Do Q" % (_grid(x_start), _grid(y_start),
+                                                     _template_name(has_records).encode()))
+
+        text_color = label.get('color', "black")
+        for x, y, text, size in label_fields(label):
+            ops.append(_pdf_text(subset, _grid(x_start + x), _grid(y_start + y), text, _grid(size), text_color))
+
+        order_name = label["order_name"]
+        if order_name in qr_codes:
+            ops.append(_pdf_qr(qr_codes[order_name], _grid(x_end - QR_SIZE - QR_RIGHT), _grid(y_start + QR_TOP),
+                               _grid(QR_SIZE)))
+
+    ops.append(b"Q")
+    return b"\n".join(ops)
+
+
+def _palette_bits(count):
+    """ Smallest PDF bit depth that can index ``count`` palette entries. """
+    for bits in (1, 2, 4):
+        if count <= 1 << bits:
+            return bits
+    return 8
+
+
+def _exact_palette_image(page, count):
+    """ Return ``page`` as a "P" image with exactly its own ``count`` colors, or None if that fails. """
+    indexed = page.quantize(colors=count, method=Image.Quantize.MAXCOVERAGE, dither=Image.Dither.NONE)
+    if ImageChops.difference(indexed.convert("RGB"), page).getbbox() is not None:
+        return None
+    return indexed
+
+
+def encode_page_image(page):
+    """
+    Encode a rendered page losslessly (Flate) in the smallest exact color model.
+
+    Pages whose pixels are all gray (black labels, captions and QR codes) are
+    stored as 1-bit gray when they are pure black and white and as 8-bit gray
+    otherwise. Other pages with at most 256 colors get an indexed palette of
+    exactly those colors; anything else is stored as RGB. Decoding gives back
+    the rendered pixels exactly.
+
+    :return: (image dictionary, encoded data) for PDFWriter.add_image_page.
+    """
+    image = {"Width": page.width, "Height": page.height, "Filter": Name("FlateDecode")}
+    # Anti-aliased colored text alone has hundreds of shades, so this usually stops early
+    colors = page.getcolors(256)
+    if colors is not None and all(red == green == blue for _count, (red, green, blue) in colors):
+        image["ColorSpace"] = Name("DeviceGray")
+        if all(red in (0, 255) for _count, (red, _green, _blue) in colors):
+            # 0 is black and 1 is white, the same as PIL's "1" mode
+            image["BitsPerComponent"] = 1
+            data = page.getchannel(0).convert("1", dither=Image.Dither.NONE).tobytes()
+        else:
+            image["BitsPerComponent"] = 8
+            data = page.getchannel(0).tobytes()
+        return image, zlib.compress(data, FLATE_LEVEL)
+
+    indexed = _exact_palette_image(page, len(colors)) if colors is not None else None
+    if indexed is not None:
+        bits = _palette_bits(len(colors))
+        palette = bytes(indexed.getpalette()[:3 * len(colors)])
+        image["ColorSpace"] = [Name("Indexed"), Name("DeviceRGB"), len(colors) - 1, palette]
+        image["BitsPerComponent"] = bits
+        data = indexed.tobytes() if bits == 8 else indexed.tobytes("raw", f"P;{bits}")
+        return image, zlib.compress(data, FLATE_LEVEL)
+
+    image["ColorSpace"] = Name("DeviceRGB")
+    image["BitsPerComponent"] = 8
+    return image, zlib.compress(page.tobytes(), FLATE_LEVEL)
+
+
+def _load_raster_fonts(dpi):
+    """ Return the (large, medium) PIL fonts for ``dpi`` from the process-wide font registry. """
+    font_path = get_font_path()
+    return (font_cache.get_font(font_path, max(1, to_pixels(FONT_SIZE_LARGE, dpi))),
+            font_cache.get_font(font_path, max(1, to_pixels(FONT_SIZE_MEDIUM, dpi))))
+
+
+def _load_vector_font():
+    """ Return the parsed TrueType font from the process-wide font registry. """
+    return font_cache.get_truetype_font(get_font_path())
+
+
+def _write_raster_pdf(pages_labels, qr_codes, output_pdf, dpi, on_page):
+    font_large, font_medium = _load_raster_fonts(dpi)
+
+    pages = []
+    for page_labels in pages_labels:
+        pages.append(render_page_image(page_labels, qr_codes, font_large, font_medium, dpi=dpi))
+        on_page()
+
+    # Save pages as a single PDF
+    pages[0].save(output_pdf, format="PDF", save_all=True, append_images=pages[1:], resolution=dpi)
+
+
+def _render_page_job(job):
+    """
+    Render and encode one page. Runs in the calling process or in a pool worker,
+    so the bytes written for a page never depend on where it was rendered.
+
+    :param job: (backend, dpi, page_labels, qr_codes) for one page; dpi is None for the vector backend.
+    :return: (content, glyphs) for the vector backend, (image dictionary, data) for raster.
+    """
+    backend, dpi, page_labels, qr_codes = job
+    if backend == "vector":
+        subset = FontSubset(_load_vector_font())
+        content = render_page_vector(page_labels, qr_codes, subset)
+        return content, subset.glyphs
+
+    font_large, font_medium = _load_raster_fonts(dpi)
+    # Only one page image is alive at a time; it is dropped once encoded
+    page = render_page_image(page_labels, qr_codes, font_large, font_medium, dpi=dpi)
+    return encode_page_image(page)
+
+
+def _page_jobs(backend, dpi, pages_labels, qr_codes):
+    # Vector pages do not depend on the resolution, so they share cache entries across profiles
+    dpi = None if backend == "vector" else dpi
+    for page_labels in pages_labels:
+        # Only send the QR URLs this page needs to the worker
+        page_qr_codes = {label["order_name"]: qr_codes[label["order_name"]]
+                         for label in page_labels if label["order_name"] in qr_codes}
+        yield backend, dpi, page_labels, page_qr_codes
+
+
+def _package_version(name):
+    """ Installed version of a distribution, or None where its metadata is missing (e.g. a frozen build). """
+    try:
+        from importlib import metadata
+        return metadata.version(name)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def layout_signature():
+    """ Everything besides the labels themselves that the page bytes depend on. """
+    font_path = get_font_path()
+    return {
+        "version": RENDER_VERSION,
+        "page": (PAGE_WIDTH, PAGE_HEIGHT, MARGIN, VECTOR_DPI),
+        "label": (LABEL_WIDTH, LABEL_HEIGHT, GAP_X, GAP_Y, NUM_ROWS, NUM_COLS),
+        "chrome": (BOX_LINE_WIDTH, DIVIDER_X, DIVIDER_TOP, DIVIDER_BOTTOM, DIVIDER_LINE_WIDTH),
+        "fonts": (os.path.basename(font_path), os.path.getsize(font_path), FONT_SIZE_LARGE, FONT_SIZE_MEDIUM),
+        "qr": (QR_SIZE, QR_RIGHT, QR_TOP, qr_cache.DEFAULT_ERROR_CORRECTION),
+        # Upgrades can change rasterization, QR modules or Flate output without a RENDER_VERSION bump
+        "libraries": (PIL.__version__, _package_version("qrcode"), zlib.ZLIB_RUNTIME_VERSION),
+    }
+
+
+def _page_cache_key(job):
+    backend, dpi, page_labels, page_qr_codes = job
+    return page_cache.page_key(layout_signature(), backend, dpi, page_labels, page_qr_codes)
+
+
+def _render_pages_cached(jobs, workers, cache):
+    """
+    Yield rendered pages in order like _render_pages, taking unchanged pages from
+    ``cache`` and rendering (and storing) only the others.
+    """
+    jobs = [(job, _page_cache_key(job)) for job in jobs]
+    cached = [cache.contains(key) for _job, key in jobs]
+    missing = len(cached) - sum(cached)
+    rendered = _render_pages((job for (job, _key), hit in zip(jobs, cached) if not hit),
+                             max(1, min(workers, missing)))
+    try:
+        for (job, key), hit in zip(jobs, cached):
+            result = cache.get(key) if hit else None
+            if result is None:
+                # A page removed from the store since the check above is rendered here
+                result = next(rendered) if not hit else _render_page_job(job)
+                cache.put(key, result)
+            yield result
+    finally:
+        rendered.close()
+
+
+def _render_pages(jobs, workers):
+    """
+    Yield rendered pages in order, using a pool of ``workers`` processes when workers > 1.
+
+    At most two pages per worker are in flight, so finished pages waiting to be
+    written never pile up in memory.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield _render_page_job(job)
+        return
+
+    # Workers share the QR code store on disk, if one is configured
+    cache = qr_cache.get_default_cache()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=qr_cache.configure_default_cache,
+                                                initargs=(cache.cache_dir, cache.max_entries)) as executor:
+        pending = collections.deque()
+        try:
+            for job in jobs:
+                pending.append(executor.submit(_render_page_job, job))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # When the caller stops early (cancel or error), drop the pages not started yet
+            for future in pending:
+                future.cancel()
+
+
+def _slot_box(slot, dpi):
+    """ Pixel box of a label slot at ``dpi``, including the gaps to its right and below. """
+    x_start, y_start = label_positions()[slot]
+    return (to_pixels(x_start, dpi), to_pixels(y_start, dpi),
+            to_pixels(min(x_start + LABEL_WIDTH + GAP_X, PAGE_WIDTH), dpi),
+            to_pixels(min(y_start + LABEL_HEIGHT + GAP_Y, PAGE_HEIGHT), dpi))
+
+
+def _write_fill_form(writer, backend, dpi, fill_labels, qr_codes, first_slot, resources, subset):
+    """
+    Write the labels for the empty slots of an existing page as a page-sized form XObject.
+
+    Raster labels are drawn as one image per slot, so only the empty slots are covered.
+    """
+    if backend == "vector":
+        content = render_page_vector(fill_labels, qr_codes, subset, first_slot)
+    else:
+        font_large, font_medium = _load_raster_fonts(dpi)
+        page = render_page_image(fill_labels, qr_codes, font_large, font_medium, first_slot, dpi)
+        scale = POINTS_PER_INCH / dpi
+        page_height = page.height
+        resources = {"XObject": {}}
+        ops = []
+        for slot in range(first_slot, first_slot + len(fill_labels)):
+            left, top, right, bottom = _slot_box(slot, dpi)
+            image, data = encode_page_image(page.crop((left, top, right, bottom)))
+            name = f"Slot{slot}"
+            resources["XObject"][name] = writer.add_stream(
+                dict(image, Type=Name("XObject"), Subtype=Name("Image")), data)
+            ops.append(b"q %s 0 0 %s %s %s cm /%s Do Q" % (
+                format_number((right - left) * scale).encode(), format_number((bottom - top) * scale).encode(),
+                format_number(left * scale).encode(), format_number((page_height - bottom) * scale).encode(),
+                name.encode()))
+        content = b"\n".join(ops)
+
+    form = {
+        "Type": Name("XObject"),
+        "Subtype": Name("Form"),
+        "BBox": [0, 0, PAGE_WIDTH, PAGE_HEIGHT],
+        "Resources": resources,
+    }
+    return writer.add_stream(form, content, compress=True)
+
+
+def _fill_last_page(update, form_ref, filled):
+    """ Replace the existing last page with one that also draws ``form_ref`` over it. """
+    document = update.document
+    page = dict(document.last_page)
+    xobjects = dict(document.last_page_xobjects)
+    name, number = "LabelFill", 1
+    while name in xobjects:
+        number += 1
+        name = f"LabelFill{number}"
+    xobjects[name] = form_ref
+
+    contents = page.get("Contents", [])
+    if not isinstance(contents, list):
+        contents = [contents]
+    # The existing content is wrapped in q/Q, so whatever graphics state it leaves cannot move the new labels
+    save_ref = update.add_stream({}, b"q")
+    draw_ref = update.add_stream({}, b"Q\nq /%s Do Q" % name.encode())
+    page["Contents"] = [save_ref, *contents, draw_ref]
+    page["Resources"] = dict(document.last_page_resources, XObject=xobjects)
+    page[SLOTS_KEY] = page[SLOTS_KEY] + filled
+    update.add(page, ref=document.last_page_ref)
+
+
+def free_slots(document):
+    """ Number of empty label slots on the last page of an ExistingDocument; 0 if unknown or full. """
+    page = document.last_page
+    if page is None or page.get("MediaBox") != [0, 0, PAGE_WIDTH, PAGE_HEIGHT]:
+        return 0
+    used = page.get(SLOTS_KEY)
+    if not isinstance(used, int) or isinstance(used, bool) or not 0 < used < LABELS_PER_PAGE:
+        return 0
+    return LABELS_PER_PAGE - used
+
+
+def _write_pages(writer, backend, dpi, pages_labels, qr_codes, workers, on_page, fill=None):
+    """
+    Render and write the pages through ``writer`` (a PDFWriter or PDFUpdate).
+
+    :param fill: Optional (labels, first slot) drawn into the empty slots of the
+                 existing last page of a PDFUpdate before the new pages.
+    """
+    resources = subset = None
+    if backend == "vector":
+        subset = FontSubset(_load_vector_font())
+        font_ref = writer.reserve()
+        resources = {"Font": {"F1": font_ref}, "XObject": write_label_templates(writer, subset, font_ref)}
+
+    if fill is not None:
+        fill_labels, first_slot = fill
+        form_ref = _write_fill_form(writer, backend, dpi, fill_labels, qr_codes, first_slot, resources, subset)
+        _fill_last_page(writer, form_ref, len(fill_labels))
+        on_page()
+
+    jobs = _page_jobs(backend, dpi, pages_labels, qr_codes)
+    cache = page_cache.get_default_cache()
+    results = _render_pages_cached(jobs, workers, cache) if cache is not None else _render_pages(jobs, workers)
+    for page_labels, result in zip(pages_labels, results):
+        extra = {SLOTS_KEY: len(page_labels)}
+        if backend == "vector":
+            content, glyphs = result
+            subset.update(glyphs)
+            writer.add_page(content, resources, extra=extra)
+        else:
+            writer.add_image_page(*result, extra=extra)
+        on_page()
+
+    if backend == "vector":
+        subset.write(writer, font_ref)
+
+
+def _write_pdf(backend, dpi, pages_labels, qr_codes, output_pdf, workers, on_page):
+    with open(output_pdf, "wb") as pdf_file:
+        writer = PDFWriter(pdf_file)
+        _write_pages(writer, backend, dpi, pages_labels, qr_codes, workers, on_page)
+        writer.close()
+
+
+def _append_pdf(document, backend, dpi, pages_labels, fill, qr_codes, output_pdf, workers, on_page):
+    with open(output_pdf, "r+b") as pdf_file:
+        update = PDFUpdate(pdf_file, document)
+        try:
+            _write_pages(update, backend, dpi, pages_labels, qr_codes, workers, on_page, fill)
+            update.close()
+        except BaseException:
+            # Cut the unfinished update off, so the file ends with its previous trailer again
+            pdf_file.truncate(document.size)
+            raise
+
+
+def generate_labels_pdf(labels_data, qr_codes, output_pdf="labels_with_qr.pdf", backend="raster", streaming=False,
+                        workers=1, progress=None, cancel=None, append=False, resolution=DEFAULT_RESOLUTION):
+    """
+    Generates a multi-page PDF of labels with a 2x6 layout and QR codes for standard letter-sized paper (8.5x11 inches).
+
+    :param labels_data: List of dictionaries with label data (order_name, batch_chip, card_envelope, color, num_records).
+    :param qr_codes: Dictionary mapping order_name to its QR code URL.
+    :param output_pdf: Output file name for the generated PDF.
+    :param backend: "raster" for page images or "vector" for native PDF drawing operators.
+    :param streaming: For the raster backend, write each page to the file as soon as it is rendered
+                      instead of keeping every page image in memory until the end. Appends are always streamed.
+    :param workers: Number of processes that render pages in parallel. The output is identical
+                    for any worker count; raster output with workers > 1 is always streamed.
+    :param progress: Optional callable receiving (pages_done, total_pages) after each page.
+    :param cancel: Optional threading.Event; when set, rendering stops at the next page and
+                   RenderCancelled is raised. Nothing is left at output_pdf either way.
+    :param append: If output_pdf already exists, add the labels to it as an incremental update
+                   (filling the empty slots of its last page first) instead of replacing it.
+                   A failed or cancelled append leaves the file as it was.
+    :param resolution: Raster resolution profile: "draft" (150 DPI), "standard" (300 DPI) or
+                       "high" (600 DPI). The geometry is the same for all; vector output ignores it.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    dpi = resolution_dpi(resolution)
+    if not labels_data:
+        raise ValueError("No pages were created. Check if labels_data is populated correctly.")
+
+    document = None
+    fill = None
+    if append and os.path.exists(output_pdf):
+        # Only the cross-reference sections and the page tree are read, not the pages
+        with open(output_pdf, "rb") as pdf_file:
+            document = ExistingDocument(pdf_file)
+        free = free_slots(document)
+        if free:
+            fill = (labels_data[:free], LABELS_PER_PAGE - free)
+            labels_data = labels_data[free:]
+
+    pages_labels = paginate(labels_data)
+
+    # Starting worker processes costs more than rendering a page or two
+    workers = max(1, min(workers or 1, len(pages_labels)))
+
+    total_pages = len(pages_labels) + (fill is not None)
+    pages_done = 0
+
+    def on_page():
+        nonlocal pages_done
+        pages_done += 1
+        if progress is not None:
+            progress(pages_done, total_pages)
+        if cancel is not None and cancel.is_set():
+            raise RenderCancelled(f"Cancelled after {pages_done} of {total_pages} pages")
+
+    if document is not None:
+        if cancel is not None and cancel.is_set():
+            raise RenderCancelled("Cancelled before the first page")
+        _append_pdf(document, backend, dpi, pages_labels, fill, qr_codes, output_pdf, workers, on_page)
+        logging.info(f"Labels added to {output_pdf}")
+        return
+
+    part_path = output_pdf + ".part"
+    try:
+        if cancel is not None and cancel.is_set():
+            raise RenderCancelled("Cancelled before the first page")
+        if backend == "raster" and not streaming and workers == 1:
+            _write_raster_pdf(pages_labels, qr_codes, part_path, dpi, on_page)
+        else:
+            _write_pdf(backend, dpi, pages_labels, qr_codes, part_path, workers, on_page)
+        os.replace(part_path, output_pdf)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    logging.info(f"Labels saved to {output_pdf}")
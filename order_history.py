@@ -0,0 +1,262 @@
+"""
+Order history (order name -> color) kept on the shared drive.
+
+OrderHistoryStore keeps an in-memory copy of order_history.json that is only
+re-read when the file's mtime or size changes, and applies queued
+(order_name, color) updates in a single read-modify-write flush.
+
+Several stations share the file, so a flush holds an advisory lock file
+(order_history.json.lock, created with O_EXCL) while it re-reads the current
+file, merges its updates into it and writes the result to a temp file that is
+renamed into place. Readers never see a half-written file, and updates from
+other stations made between our load and our flush are kept.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+MAX_HISTORY_ENTRIES = 20
+
+# Lock contention is logged here, so an application can record it apart from its error log
+lock_log = logging.getLogger("order_history.lock")
+
+
+class HistoryLockTimeout(OSError):
+    """ Raised when the history lock file could not be acquired in time. """
+
+
+class HistoryFileLock:
+    """
+    Advisory lock shared between stations through a lock file next to the history file.
+
+    :param path: Path of the lock file.
+    :param timeout: Seconds to wait for the lock before raising HistoryLockTimeout.
+    :param stale_after: Seconds after which a lock left by a crashed station is broken.
+    """
+
+    def __init__(self, path, timeout=10.0, stale_after=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.acquisitions = 0
+        self.stale_breaks = 0
+
+    def _break_if_stale(self):
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if age > self.stale_after:
+            try:
+                os.remove(self.path)
+                self.stale_breaks += 1
+                lock_log.warning(f"Removed stale history lock '{self.path}' ({age:.0f} s old)")
+            except FileNotFoundError:
+                pass
+
+    def acquire(self):
+        start = time.monotonic()
+        delay = 0.01
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                pass
+            except PermissionError:
+                # Windows reports a lock file that is being deleted as access denied
+                pass
+            if time.monotonic() - start >= self.timeout:
+                raise HistoryLockTimeout(f"Timed out after {self.timeout:.0f} s waiting for '{self.path}'")
+            self._break_if_stale()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+        with os.fdopen(fd, 'w') as file:
+            file.write(f"{socket.gethostname()} {os.getpid()} {time.time():.3f}\n")
+
+        wait = time.monotonic() - start
+        self.last_wait = wait
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.acquisitions += 1
+        if wait >= 1.0:
+            lock_log.warning(f"Waited {wait:.2f} s for the order history lock")
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {
+            "acquisitions": self.acquisitions,
+            "last_wait": self.last_wait,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+            "stale_breaks": self.stale_breaks,
+        }
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def write_json_atomic(path, data, retries=5):
+    """ Write ``data`` to a temp file in the same folder and rename it over ``path``. """
+    temp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    for attempt in range(retries):
+        try:
+            os.replace(temp_path, path)
+            return
+        except PermissionError:
+            # On Windows the rename fails while another station has the file open for reading
+            if attempt == retries - 1:
+                os.remove(temp_path)
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def apply_history_updates(history, updates, max_entries=MAX_HISTORY_ENTRIES):
+    """
+    Apply (order_name, color) updates in order, as repeated single updates would.
+
+    Each update removes any existing entry for the order, appends the new one
+    at the end (newest last) and only the last ``max_entries`` are kept.
+    """
+    entries = {entry['order_name']: entry for entry in history}
+    for order_name, color in updates:
+        entries.pop(order_name, None)
+        entries[order_name] = {"order_name": order_name, "color": color}
+    history = list(entries.values())
+    return history[-max_entries:]
+
+
+class OrderHistoryStore:
+    """
+    Cached, write-behind access to the order history file.
+
+    :param path_getter: Callable returning the history file path; called lazily because
+                        resolving it may create folders on the shared drive.
+    :param max_entries: Number of most recent orders kept in the file.
+    :param revalidate_after: Seconds a cached copy is trusted before the file is stat'ed again.
+    :param lock_timeout: Seconds a flush waits for another station's lock before giving up.
+    """
+
+    def __init__(self, path_getter, max_entries=MAX_HISTORY_ENTRIES, revalidate_after=2.0, lock_timeout=10.0):
+        self._path_getter = path_getter
+        self._path = None
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._history = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._pending = []
+        self._lock = threading.RLock()
+        self.lock_timeout = lock_timeout
+        self._file_lock = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = self._path_getter()
+        return self._path
+
+    @property
+    def file_lock(self):
+        if self._file_lock is None:
+            self._file_lock = HistoryFileLock(self.path + ".lock", timeout=self.lock_timeout)
+        return self._file_lock
+
+    def lock_stats(self):
+        """ Lock wait instrumentation: acquisitions, last/total/max wait in seconds, stale locks broken. """
+        return self.file_lock.stats()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as file:
+                history = json.load(file)
+        except ValueError as e:
+            # A file truncated by an older version must not stop the app from starting
+            logging.error(f"Order history file is corrupt, ignoring its contents: {str(e)}")
+            return list(self._history or [])
+        if not isinstance(history, list):
+            logging.error("Order history file does not hold a list, ignoring its contents")
+            return list(self._history or [])
+        return history
+
+    def _write(self, history):
+        write_json_atomic(self.path, history)
+
+    def load(self, force=False):
+        """
+        Return the history (oldest first) including queued updates.
+
+        The file is only re-read when its mtime or size changed since the last read.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if force or self._history is None or now - self._checked_at >= self.revalidate_after:
+                signature = self._file_signature()
+                if force or self._history is None or signature != self._signature:
+                    self._history = self._read() if signature is not None else []
+                    self._signature = signature
+                self._checked_at = now
+            return apply_history_updates(self._history, self._pending, self.max_entries)
+
+    def queue_update(self, order_name, color):
+        """ Record an update in memory; it is written by the next flush(). """
+        with self._lock:
+            self._pending.append((order_name, color))
+
+    def flush(self):
+        """
+        Write all queued updates with one read of the current file and one write.
+
+        The read and write happen under the lock file, so updates other stations
+        flushed since our last load are merged instead of overwritten.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            with self.file_lock:
+                history = self.load(force=True)
+                self._write(history)
+                self._history = history
+                self._signature = self._file_signature()
+            self._checked_at = time.monotonic()
+            self._pending.clear()
+
+    def update_many(self, updates):
+        """ Queue a batch of (order_name, color) updates and flush them together. """
+        with self._lock:
+            self._pending.extend(updates)
+            try:
+                self.flush()
+            except OSError as e:
+                logging.error(f"Failed to save order history: {str(e)}")
+                raise
+
+    def update(self, order_name, color):
+        self.update_many([(order_name, color)])
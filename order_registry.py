@@ -0,0 +1,144 @@
+"""
+SQLite registry of every order's color, with no retention limit.
+
+order_history.json only keeps the last 20 orders, so colors of older repeat
+customers were lost. The registry keeps one row per order name (primary key,
+so lookups are an index search) with the time it was last used (indexed, so
+"most recent N" for the history panel is a short index scan).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_colors (
+    order_name TEXT PRIMARY KEY,
+    color TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_order_colors_last_used ON order_colors (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Spacing between timestamps of updates recorded in one batch, so their order is kept
+_BATCH_STEP = 1e-6
+
+
+class OrderRegistry:
+    """
+    Order name -> color store backed by an SQLite file.
+
+    :param path: Database file; a local path, or a shared one to use the same registry on every station.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_synced = None
+        self._connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def lookup_color(self, order_name):
+        """ Return the last color used for ``order_name``, or None if the order is unknown. """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT color FROM order_colors WHERE order_name = ?", (order_name,)).fetchone()
+        return row[0] if row else None
+
+    def lookup_colors(self, order_names):
+        """ Return {order_name: color} for the given orders that are in the registry. """
+        colors = {}
+        for order_name in set(order_names):
+            color = self.lookup_color(order_name)
+            if color is not None:
+                colors[order_name] = color
+        return colors
+
+    def record(self, updates, timestamp=None):
+        """
+        Store a batch of (order_name, color) updates in one transaction.
+
+        Later updates in the batch count as more recently used.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = [(order_name, color, timestamp + i * _BATCH_STEP) for i, (order_name, color) in enumerate(updates)]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO order_colors (order_name, color, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT (order_name) DO UPDATE SET color = excluded.color, last_used = excluded.last_used",
+                rows)
+
+    def recent(self, limit=20):
+        """ Return the ``limit`` most recently used orders, oldest first like order_history.json. """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT order_name, color FROM order_colors ORDER BY last_used DESC LIMIT ?", (limit,)).fetchall()
+        return [{"order_name": order_name, "color": color} for order_name, color in reversed(rows)]
+
+    def sync_history(self, history):
+        """
+        Bring in entries of the shared history file that other stations added or recolored.
+
+        Orders whose color is unchanged keep their last-used time; changed or new
+        ones are recorded as used now, in the file's order.
+        """
+        signature = tuple((entry['order_name'], entry['color']) for entry in history)
+        if signature == self._last_synced:
+            return
+        known = self.lookup_colors(name for name, _color in signature)
+        changed = [(name, color) for name, color in signature if known.get(name) != color]
+        self.record(changed)
+        self._last_synced = signature
+
+    def json_history_imported(self):
+        """ Whether import_json_history has completed for this registry. """
+        with self._lock:
+            return self._connection.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone() is not None
+
+    def import_json_history(self, history_file_path):
+        """
+        One-time import of an existing order_history.json.
+
+        Imported entries are dated just before now, oldest first, and never
+        override an order already in the registry. Returns the number of rows added.
+        If the file cannot be read, nothing is recorded and a later call tries again.
+        """
+        if self.json_history_imported():
+            return 0
+
+        history = []
+        if os.path.exists(history_file_path):
+            try:
+                with open(history_file_path, 'r') as file:
+                    history = json.load(file)
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to import order history into the registry: {str(e)}")
+                return 0
+
+        now = time.time()
+        rows = [(entry['order_name'], entry['color'], now - (len(history) - i) * _BATCH_STEP)
+                for i, entry in enumerate(history)]
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO order_colors (order_name, color, last_used) VALUES (?, ?, ?)", rows)
+            added = self._connection.total_changes - before
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (history_file_path,))
+        return added
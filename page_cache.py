@@ -0,0 +1,141 @@
+"""
+Content-addressed on-disk cache of rendered and encoded PDF pages.
+
+A page is stored under a hash of everything that affects its bytes (labels,
+colors, QR URLs, layout and renderer version), so re-creating a PDF after a
+small edit only renders the pages that actually changed. The store is bounded:
+once it grows past ``max_bytes`` the least recently used pages are deleted.
+
+Entries are pickled, so the cache directory must be private to the user
+(the default is under the local application data folder).
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def page_key(*parts):
+    """ Hash JSON-serializable parts (dict keys sorted) into a cache key. """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """
+    Bounded directory of encoded pages.
+
+    :param cache_dir: Directory of the store; created if missing.
+    :param max_bytes: Size the store is pruned back to, least recently used pages first.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._written_since_prune = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.page")
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """ Return the stored page for ``key``, or None if it is not cached (or unreadable). """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as stored:
+                page = pickle.load(stored)
+            # Reading marks the page as recently used for pruning
+            os.utime(path)
+        except FileNotFoundError:
+            page = None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            page = None
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            if page is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return page
+
+    def put(self, key, page):
+        """ Store a page; failures only cost a re-render next time. """
+        data = pickle.dumps(page, protocol=pickle.HIGHEST_PROTOCOL)
+        # Write to a temp file and rename so a concurrent reader never sees half a page
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._written_since_prune += len(data)
+            prune_due = self._written_since_prune >= self.max_bytes // 10
+            if prune_due:
+                self._written_since_prune = 0
+        if prune_due:
+            self.prune()
+
+    def prune(self):
+        """ Delete the least recently used pages until the store fits in max_bytes. """
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".page"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+# Process-wide cache used by the label renderer; None until an application configures a directory
+default_cache = None
+
+
+def configure_default_cache(cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    """ Enable (or with cache_dir=None disable) the process-wide page cache. """
+    global default_cache
+    if cache_dir is None:
+        default_cache = None
+    elif default_cache is None or default_cache.cache_dir != cache_dir or default_cache.max_bytes != max_bytes:
+        default_cache = PageCache(cache_dir, max_bytes=max_bytes)
+    return default_cache
+
+
+def get_default_cache():
+    return default_cache
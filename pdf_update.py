@@ -0,0 +1,364 @@
+"""
+Incremental updates of existing label PDFs.
+
+An incremental update appends new and replaced objects, a cross-reference
+section for just those objects and a trailer pointing back to the previous
+one (/Prev) to the end of the file. The bytes already in the file are never
+read back as pages or rewritten, so adding a few labels to a large batch only
+costs the new pages.
+
+The reader understands classic cross-reference tables, which is what
+PDFWriter and Pillow write; files with cross-reference streams or encryption
+are refused with a ValueError.
+"""
+import re
+
+from pdf_writer import Name, PDFWriter, Ref, serialize
+
+_WHITESPACE = b"\x00\t\n\x0c\r "
+_DELIMITERS = b"()<>[]{}/%"
+_REGULAR = re.compile(rb"[^\x00\t\n\x0c\r ()<>\[\]{}/%]+")
+_XREF_ENTRY = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+_STRING_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f",
+                   ord("("): b"(", ord(")"): b")", ord("\\"): b"\\"}
+
+
+class _Truncated(Exception):
+    """ The buffer ended before the object being parsed did. """
+
+
+class _Parser:
+    """ Parses PDF object syntax (no stream data) from a byte buffer. """
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def _skip(self):
+        data = self.data
+        while self.pos < len(data):
+            char = data[self.pos]
+            if char in _WHITESPACE:
+                self.pos += 1
+            elif char == 0x25:  # % comment runs to the end of the line
+                while self.pos < len(data) and data[self.pos] not in b"\r\n":
+                    self.pos += 1
+            else:
+                return
+        raise _Truncated()
+
+    def peek(self, token):
+        self._skip()
+        return self.data.startswith(token, self.pos)
+
+    def expect(self, token):
+        if not self.peek(token):
+            if len(self.data) - self.pos < len(token):
+                raise _Truncated()
+            raise ValueError(f"Expected {token!r} at offset {self.pos} of the PDF data")
+        self.pos += len(token)
+
+    def regular(self):
+        self._skip()
+        match = _REGULAR.match(self.data, self.pos)
+        if match is None:
+            raise ValueError(f"Unexpected byte {self.data[self.pos:self.pos + 1]!r} in the PDF data")
+        if match.end() == len(self.data):
+            raise _Truncated()
+        self.pos = match.end()
+        return match.group()
+
+    def integer(self):
+        token = self.regular()
+        if not token.isdigit():
+            raise ValueError(f"Expected an integer, got {token!r}")
+        return int(token)
+
+    def value(self):
+        self._skip()
+        data = self.data
+        if data.startswith(b"<<", self.pos):
+            self.pos += 2
+            result = {}
+            while not self.peek(b">>"):
+                key = self.value()
+                if not isinstance(key, Name):
+                    raise ValueError(f"Dictionary key {key!r} is not a name")
+                result[str(key)] = self.value()
+            self.pos += 2
+            return result
+        char = data[self.pos]
+        if char == 0x5B:  # [
+            self.pos += 1
+            items = []
+            while not self.peek(b"]"):
+                items.append(self.value())
+            self.pos += 1
+            return items
+        if char == 0x2F:  # /
+            self.pos += 1
+            match = _REGULAR.match(data, self.pos)
+            raw = match.group() if match else b""
+            self.pos += len(raw)
+            raw = _NAME_ESCAPE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+            return Name(raw.decode("utf-8", errors="replace"))
+        if char == 0x28:  # (
+            return self._literal_string()
+        if char == 0x3C:  # <
+            end = data.find(b">", self.pos)
+            if end < 0:
+                raise _Truncated()
+            digits = bytes(byte for byte in data[self.pos + 1:end] if byte not in _WHITESPACE)
+            self.pos = end + 1
+            return bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii"))
+
+        token = self.regular()
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        if token.isdigit():
+            # "num gen R" is a reference
+            saved = self.pos
+            try:
+                generation = self.regular()
+                if generation.isdigit() and self.regular() == b"R":
+                    return Ref(int(token))
+            except ValueError:
+                pass
+            self.pos = saved
+            return int(token)
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                raise ValueError(f"Unexpected token {token!r} in the PDF data") from None
+
+    def _literal_string(self):
+        data = self.data
+        self.pos += 1
+        out = bytearray()
+        depth = 1
+        while True:
+            if self.pos >= len(data):
+                raise _Truncated()
+            char = data[self.pos]
+            self.pos += 1
+            if char == 0x5C:  # backslash
+                if self.pos >= len(data):
+                    raise _Truncated()
+                escaped = data[self.pos]
+                self.pos += 1
+                if escaped in _STRING_ESCAPES:
+                    out += _STRING_ESCAPES[escaped]
+                elif 0x30 <= escaped <= 0x37:
+                    digits = bytes([escaped])
+                    while len(digits) < 3 and self.pos < len(data) and 0x30 <= data[self.pos] <= 0x37:
+                        digits += data[self.pos:self.pos + 1]
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif escaped == 0x0D and data.startswith(b"\n", self.pos):
+                    self.pos += 1
+                elif escaped not in b"\r\n":
+                    out.append(escaped)
+                continue
+            if char == 0x28:
+                depth += 1
+            elif char == 0x29:
+                depth -= 1
+                if depth == 0:
+                    return out.decode("latin-1")
+            out.append(char)
+
+
+def _read_at(file, offset, parse):
+    """ Parse the structure at ``offset``, reading more of the file until it fits in the buffer. """
+    size = 64 * 1024
+    while True:
+        file.seek(offset)
+        data = file.read(size)
+        try:
+            return parse(_Parser(data))
+        except _Truncated:
+            if len(data) < size:
+                raise ValueError(f"The PDF ends inside the data at offset {offset}") from None
+            size *= 4
+
+
+def _parse_xref_section(parser):
+    """ Return ({object number: offset}, trailer dictionary) of one classic cross-reference section. """
+    if not parser.peek(b"xref"):
+        raise ValueError("PDFs with cross-reference streams cannot be appended to")
+    parser.expect(b"xref")
+    offsets = {}
+    while not parser.peek(b"trailer"):
+        start = parser.integer()
+        count = parser.integer()
+        for num in range(start, start + count):
+            parser._skip()
+            match = _XREF_ENTRY.match(parser.data, parser.pos)
+            if match is None:
+                if len(parser.data) - parser.pos < 20:
+                    raise _Truncated()
+                raise ValueError(f"Malformed cross-reference entry for object {num}")
+            parser.pos = match.end()
+            if match.group(3) == b"n":
+                offsets[num] = int(match.group(1))
+    parser.expect(b"trailer")
+    return offsets, parser.value()
+
+
+class ExistingDocument:
+    """
+    The parts of an existing PDF needed to append pages to it: the trailer,
+    the object offsets, the root page tree node and the last page.
+
+    :param file: Binary file object opened for reading; only the cross-reference
+                 sections and a few small objects are read.
+    """
+
+    def __init__(self, file):
+        file.seek(0, 2)
+        self.size = file.tell()
+        file.seek(max(0, self.size - 1024))
+        tail = file.read()
+        at = tail.rfind(b"startxref")
+        if at < 0:
+            raise ValueError("Not a PDF file (no startxref)")
+        self.xref_offset = _Parser(tail + b"\n", at + len(b"startxref")).integer()
+
+        # Newer sections (read first) win over the ones they update
+        self.offsets = {}
+        self.trailer = None
+        section_offset, seen = self.xref_offset, set()
+        while section_offset is not None and section_offset not in seen:
+            seen.add(section_offset)
+            offsets, trailer = _read_at(file, section_offset, _parse_xref_section)
+            for num, offset in offsets.items():
+                self.offsets.setdefault(num, offset)
+            if self.trailer is None:
+                self.trailer = trailer
+            section_offset = trailer.get("Prev")
+
+        if "Encrypt" in self.trailer:
+            raise ValueError("Encrypted PDFs cannot be appended to")
+        if not isinstance(self.trailer.get("Root"), Ref):
+            raise ValueError("The PDF trailer has no document catalog")
+        self.object_count = self.trailer["Size"]
+
+        catalog = self.read_object(file, self.trailer["Root"])
+        self.pages_ref = catalog["Pages"]
+        self.pages = self.read_object(file, self.pages_ref)
+        self.page_count = self.pages.get("Count", 0)
+
+        # The last page is the last leaf of the page tree
+        self.last_page_ref = None
+        self.last_page = None
+        node = self.pages
+        while node.get("Kids"):
+            ref = node["Kids"][-1]
+            node = self.read_object(file, ref)
+            if node.get("Type") != "Pages":
+                self.last_page_ref, self.last_page = ref, node
+                break
+
+        # Resources are resolved now, so a fill can extend them without reading the file again
+        self.last_page_resources = {}
+        self.last_page_xobjects = {}
+        if self.last_page is not None:
+            self.last_page_resources = self.resolve(file, self.last_page.get("Resources", {}))
+            self.last_page_xobjects = self.resolve(file, self.last_page_resources.get("XObject", {}))
+
+    def read_object(self, file, ref):
+        """ Parse the indirect object ``ref`` (without its stream data, if any). """
+        if ref.num not in self.offsets:
+            raise ValueError(f"PDF object {ref.num} is missing from the cross-reference table")
+
+        def parse(parser):
+            if parser.integer() != ref.num:
+                raise ValueError(f"Cross-reference offset of PDF object {ref.num} is wrong")
+            parser.integer()
+            parser.expect(b"obj")
+            return parser.value()
+
+        return _read_at(file, self.offsets[ref.num], parse)
+
+    def resolve(self, file, value):
+        return self.read_object(file, value) if isinstance(value, Ref) else value
+
+
+class PDFUpdate(PDFWriter):
+    """
+    Writes an incremental update at the end of an existing PDF.
+
+    New pages are added to the root page tree node; objects of the existing
+    document can be replaced by writing them again with ``add(obj, ref)``.
+
+    :param file: The PDF opened for reading and writing ("r+b").
+    :param document: ExistingDocument read from the same, unchanged file.
+    """
+
+    def __init__(self, file, document):
+        file.seek(0, 2)
+        if file.tell() != document.size:
+            raise ValueError("The PDF changed since it was read")
+        self._file = file
+        self._position = document.size
+        self._offsets = {}
+        self._next_num = document.object_count
+        self._page_refs = list(document.pages.get("Kids", []))
+        self._new_page_count = 0
+        self.pages_ref = document.pages_ref
+        self.document = document
+
+        # The update must start on a line of its own
+        file.seek(max(0, document.size - 1))
+        if document.size and file.read(1) not in (b"\n", b"\r"):
+            file.seek(0, 2)
+            self._write(b"\n")
+        file.seek(0, 2)
+
+    @property
+    def page_count(self):
+        return self.document.page_count + self._new_page_count
+
+    def add_page(self, content, resources, media_box=(0, 0, 612, 792), extra=None):
+        page_ref = super().add_page(content, resources, media_box, extra)
+        self._new_page_count += 1
+        return page_ref
+
+    def close(self):
+        """ Write the updated page tree node, the cross-reference section and the trailer. """
+        document = self.document
+        if self._new_page_count:
+            self.add(dict(document.pages, Kids=self._page_refs, Count=self.page_count), ref=self.pages_ref)
+
+        missing = [num for num in range(document.object_count, self._next_num) if num not in self._offsets]
+        if missing:
+            raise ValueError(f"Reserved PDF objects were never written: {missing}")
+
+        # One subsection per run of consecutive object numbers
+        xref_offset = self._position
+        lines = [b"xref\n"]
+        nums = sorted(self._offsets)
+        run_start = 0
+        for index in range(1, len(nums) + 1):
+            if index == len(nums) or nums[index] != nums[index - 1] + 1:
+                lines.append(b"%d %d\n" % (nums[run_start], index - run_start))
+                for num in nums[run_start:index]:
+                    lines.append(b"%010d 00000 n \n" % self._offsets[num])
+                run_start = index
+        self._write(b"".join(lines))
+
+        trailer = {"Size": self._next_num, "Root": document.trailer["Root"]}
+        for key in ("Info", "ID"):
+            if key in document.trailer:
+                trailer[key] = document.trailer[key]
+        trailer["Prev"] = document.xref_offset
+        self._write(b"trailer\n%s\nstartxref\n%d\n%%%%EOF\n" % (serialize(trailer), xref_offset))
+        self._file.flush()
@@ -0,0 +1,529 @@
+"""
+Minimal PDF writer used by the label renderer.
+
+Objects are written to the output file as soon as they are added, so only the
+cross-reference offsets are kept in memory. TrueType fonts are embedded as
+CIDFontType2 subsets that only carry the glyphs a document actually uses.
+"""
+import hashlib
+import struct
+import zlib
+
+
+class Name(str):
+    """A PDF name object, e.g. Name("Page") is written as /Page."""
+    __slots__ = ()
+
+
+class Ref:
+    """An indirect reference to an object in the document."""
+    __slots__ = ("num",)
+
+    def __init__(self, num):
+        self.num = num
+
+    def __eq__(self, other):
+        return isinstance(other, Ref) and other.num == self.num
+
+    def __hash__(self):
+        return hash(self.num)
+
+    def __repr__(self):
+        return f"Ref({self.num})"
+
+
+def format_number(value):
+    """Format a number for a content stream without exponent notation."""
+    if isinstance(value, int):
+        return str(value)
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def _escape_name(name):
+    out = []
+    for char in name.encode("utf-8"):
+        if 33 <= char <= 126 and chr(char) not in "#()<>[]{}/%":
+            out.append(chr(char))
+        else:
+            out.append(f"#{char:02X}")
+    return "/" + "".join(out)
+
+
+def _escape_string(text):
+    data = text.encode("latin-1", errors="replace")
+    data = data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + data.replace(b"\r", b"\\r").replace(b"\n", b"\\n") + b")"
+
+
+def serialize(obj):
+    """Serialize a Python value into PDF object syntax."""
+    if isinstance(obj, Name):
+        return _escape_name(obj).encode("ascii")
+    if isinstance(obj, Ref):
+        return b"%d 0 R" % obj.num
+    if isinstance(obj, bool):
+        return b"true" if obj else b"false"
+    if isinstance(obj, (int, float)):
+        return format_number(obj).encode("ascii")
+    if obj is None:
+        return b"null"
+    if isinstance(obj, str):
+        return _escape_string(obj)
+    if isinstance(obj, bytes):
+        return b"<" + obj.hex().upper().encode("ascii") + b">"
+    if isinstance(obj, dict):
+        items = b" ".join(_escape_name(key).encode("ascii") + b" " + serialize(value)
+                          for key, value in obj.items())
+        return b"<< " + items + b" >>"
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b" ".join(serialize(item) for item in obj) + b"]"
+    raise TypeError(f"Cannot serialize {type(obj).__name__} into a PDF object")
+
+
+class PDFWriter:
+    """
+    Writes a PDF document object by object to a binary file.
+
+    :param file: Binary file object opened for writing.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._position = 0
+        self._offsets = {}
+        self._next_num = 1
+        self._page_refs = []
+        self.pages_ref = self.reserve()
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self._file.write(data)
+        self._position += len(data)
+
+    @property
+    def page_count(self):
+        return len(self._page_refs)
+
+    def reserve(self):
+        """Reserve an object number for an object that is written later."""
+        ref = Ref(self._next_num)
+        self._next_num += 1
+        return ref
+
+    def add(self, obj, ref=None):
+        """Write an object, optionally into a previously reserved number."""
+        ref = ref or self.reserve()
+        self._offsets[ref.num] = self._position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (ref.num, serialize(obj)))
+        return ref
+
+    def add_stream(self, dictionary, data, ref=None, compress=False):
+        """Write a stream object; ``compress`` applies FlateDecode to ``data``."""
+        ref = ref or self.reserve()
+        dictionary = dict(dictionary)
+        if compress:
+            data = zlib.compress(data, 6)
+            dictionary["Filter"] = Name("FlateDecode")
+        dictionary["Length"] = len(data)
+        self._offsets[ref.num] = self._position
+        self._write(b"%d 0 obj\n%s\nstream\n" % (ref.num, serialize(dictionary)))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+        return ref
+
+    def add_page(self, content, resources, media_box=(0, 0, 612, 792), extra=None):
+        """
+        Write a page with a single content stream and return its reference.
+
+        :param extra: Optional additional entries for the page dictionary.
+        """
+        content_ref = self.add_stream({}, content, compress=True)
+        page = {
+            "Type": Name("Page"),
+            "Parent": self.pages_ref,
+            "MediaBox": list(media_box),
+            "Resources": resources,
+            "Contents": content_ref,
+        }
+        if extra:
+            page.update(extra)
+        page_ref = self.add(page)
+        self._page_refs.append(page_ref)
+        return page_ref
+
+    def add_image_page(self, image, data, media_box=(0, 0, 612, 792), extra=None):
+        """
+        Write a page that shows one already encoded image stretched over the media box.
+
+        :param image: Image XObject dictionary (Width, Height, ColorSpace, Filter, ...).
+        :param data: Encoded image data matching the dictionary's Filter.
+        :param extra: Optional additional entries for the page dictionary.
+        """
+        image_ref = self.add_stream(dict(image, Type=Name("XObject"), Subtype=Name("Image")), data)
+        width = media_box[2] - media_box[0]
+        height = media_box[3] - media_box[1]
+        content = b"q %s 0 0 %s %s %s cm /Im0 Do Q" % (
+            format_number(width).encode(), format_number(height).encode(),
+            format_number(media_box[0]).encode(), format_number(media_box[1]).encode())
+        return self.add_page(content, {"XObject": {"Im0": image_ref}}, media_box, extra)
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        self.add({"Type": Name("Pages"), "Kids": self._page_refs, "Count": len(self._page_refs)},
+                 ref=self.pages_ref)
+        catalog_ref = self.add({"Type": Name("Catalog"), "Pages": self.pages_ref})
+        info_ref = self.add({"Producer": "Label Maker"})
+
+        missing = [num for num in range(1, self._next_num) if num not in self._offsets]
+        if missing:
+            raise ValueError(f"Reserved PDF objects were never written: {missing}")
+
+        xref_offset = self._position
+        lines = [b"xref\n0 %d\n" % self._next_num, b"0000000000 65535 f \n"]
+        for num in range(1, self._next_num):
+            lines.append(b"%010d 00000 n \n" % self._offsets[num])
+        self._write(b"".join(lines))
+        trailer = {"Size": self._next_num, "Root": catalog_ref, "Info": info_ref}
+        self._write(b"trailer\n%s\nstartxref\n%d\n%%%%EOF\n" % (serialize(trailer), xref_offset))
+
+
+class TrueTypeFont:
+    """
+    Reads the tables of a glyf-based TrueType font needed to embed it in a PDF.
+
+    :param path: Path to the .ttf file.
+    """
+
+    # Tables required by the PDF specification for an embedded TrueType program
+    SUBSET_TABLES = (b"head", b"hhea", b"maxp", b"hmtx", b"loca", b"glyf", b"cvt ", b"fpgm", b"prep")
+
+    def __init__(self, path):
+        with open(path, "rb") as font_file:
+            self.data = font_file.read()
+
+        num_tables = struct.unpack(">H", self.data[4:6])[0]
+        self.tables = {}
+        for i in range(num_tables):
+            tag, _checksum, offset, length = struct.unpack(">4sIII", self.data[12 + 16 * i:28 + 16 * i])
+            self.tables[tag] = (offset, length)
+
+        head = self.table(b"head")
+        self.units_per_em = struct.unpack(">H", head[18:20])[0]
+        self.bbox = struct.unpack(">4h", head[36:44])
+        self.index_to_loc_format = struct.unpack(">h", head[50:52])[0]
+
+        hhea = self.table(b"hhea")
+        self.ascender, self.descender = struct.unpack(">hh", hhea[4:8])
+        num_h_metrics = struct.unpack(">H", hhea[34:36])[0]
+        self.num_glyphs = struct.unpack(">H", self.table(b"maxp")[4:6])[0]
+
+        hmtx = self.table(b"hmtx")
+        advances = [struct.unpack(">H", hmtx[4 * i:4 * i + 2])[0] for i in range(num_h_metrics)]
+        advances += [advances[-1]] * (self.num_glyphs - num_h_metrics)
+        self.advances = advances
+
+        self.cap_height = self.ascender
+        self.weight = 400
+        if b"OS/2" in self.tables:
+            os2 = self.table(b"OS/2")
+            version, _avg_width, self.weight = struct.unpack(">HhH", os2[0:6])
+            if version >= 2 and len(os2) >= 90:
+                self.cap_height = struct.unpack(">h", os2[88:90])[0]
+
+        self.italic_angle = 0.0
+        if b"post" in self.tables:
+            self.italic_angle = struct.unpack(">i", self.table(b"post")[4:8])[0] / 65536.0
+
+        self.postscript_name = self._read_postscript_name()
+        self.cmap = self._read_cmap()
+
+        loca = self.table(b"loca")
+        if self.index_to_loc_format == 0:
+            self.loca = [offset * 2 for offset in struct.unpack(f">{self.num_glyphs + 1}H", loca[:2 * (self.num_glyphs + 1)])]
+        else:
+            self.loca = list(struct.unpack(f">{self.num_glyphs + 1}I", loca[:4 * (self.num_glyphs + 1)]))
+
+    def table(self, tag):
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def _read_postscript_name(self):
+        if b"name" not in self.tables:
+            return "Font"
+        name = self.table(b"name")
+        count, string_offset = struct.unpack(">HH", name[2:6])
+        for i in range(count):
+            platform_id, encoding_id, _lang, name_id, length, offset = struct.unpack(
+                ">6H", name[6 + 12 * i:18 + 12 * i])
+            if name_id != 6:
+                continue
+            raw = name[string_offset + offset:string_offset + offset + length]
+            if platform_id in (0, 3):
+                return raw.decode("utf-16-be", errors="ignore")
+            return raw.decode("latin-1")
+        return "Font"
+
+    def _read_cmap(self):
+        cmap = self.table(b"cmap")
+        num_subtables = struct.unpack(">H", cmap[2:4])[0]
+        candidates = {}
+        for i in range(num_subtables):
+            platform_id, encoding_id, offset = struct.unpack(">HHI", cmap[4 + 8 * i:12 + 8 * i])
+            candidates[(platform_id, encoding_id)] = offset
+
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            if key not in candidates:
+                continue
+            offset = candidates[key]
+            fmt = struct.unpack(">H", cmap[offset:offset + 2])[0]
+            if fmt == 4:
+                return self._read_cmap_format4(cmap, offset)
+            if fmt == 12:
+                return self._read_cmap_format12(cmap, offset)
+        raise ValueError("Font has no supported Unicode cmap subtable")
+
+    @staticmethod
+    def _read_cmap_format4(cmap, offset):
+        seg_count = struct.unpack(">H", cmap[offset + 6:offset + 8])[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * seg_count + 2
+        deltas_at = starts_at + 2 * seg_count
+        range_offsets_at = deltas_at + 2 * seg_count
+        ends = struct.unpack(f">{seg_count}H", cmap[ends_at:ends_at + 2 * seg_count])
+        starts = struct.unpack(f">{seg_count}H", cmap[starts_at:starts_at + 2 * seg_count])
+        deltas = struct.unpack(f">{seg_count}h", cmap[deltas_at:deltas_at + 2 * seg_count])
+        range_offsets = struct.unpack(f">{seg_count}H", cmap[range_offsets_at:range_offsets_at + 2 * seg_count])
+
+        mapping = {}
+        for seg in range(seg_count):
+            for code in range(starts[seg], ends[seg] + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offsets[seg] == 0:
+                    gid = (code + deltas[seg]) & 0xFFFF
+                else:
+                    at = range_offsets_at + 2 * seg + range_offsets[seg] + 2 * (code - starts[seg])
+                    gid = struct.unpack(">H", cmap[at:at + 2])[0]
+                    if gid:
+                        gid = (gid + deltas[seg]) & 0xFFFF
+                if gid:
+                    mapping[code] = gid
+        return mapping
+
+    @staticmethod
+    def _read_cmap_format12(cmap, offset):
+        num_groups = struct.unpack(">I", cmap[offset + 12:offset + 16])[0]
+        mapping = {}
+        for i in range(num_groups):
+            start, end, start_gid = struct.unpack(">III", cmap[offset + 16 + 12 * i:offset + 28 + 12 * i])
+            for code in range(start, end + 1):
+                mapping[code] = start_gid + code - start
+        return mapping
+
+    def glyph_id(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def _glyph_data(self, gid):
+        start, end = self.loca[gid], self.loca[gid + 1]
+        offset = self.tables[b"glyf"][0]
+        return self.data[offset + start:offset + end]
+
+    def _with_components(self, gids):
+        """Add the components referenced by composite glyphs."""
+        keep = set(gids) | {0}
+        stack = list(keep)
+        while stack:
+            glyph = self._glyph_data(stack.pop())
+            if len(glyph) < 10 or struct.unpack(">h", glyph[0:2])[0] >= 0:
+                continue
+            pos = 10
+            while True:
+                flags, component = struct.unpack(">HH", glyph[pos:pos + 4])
+                if component not in keep:
+                    keep.add(component)
+                    stack.append(component)
+                pos += 4 + (4 if flags & 0x0001 else 2)
+                if flags & 0x0008:
+                    pos += 2
+                elif flags & 0x0040:
+                    pos += 4
+                elif flags & 0x0080:
+                    pos += 8
+                if not flags & 0x0020:
+                    break
+        return keep
+
+    def subset(self, gids):
+        """
+        Build a font program containing only the given glyphs.
+
+        Glyph ids are preserved (unused glyphs become empty), so the PDF can
+        address glyphs with an Identity CIDToGIDMap.
+        """
+        keep = self._with_components(gids)
+
+        glyf = bytearray()
+        offsets = []
+        for gid in range(self.num_glyphs):
+            offsets.append(len(glyf))
+            if gid in keep:
+                glyph = self._glyph_data(gid)
+                glyf += glyph + b"\0" * (-len(glyph) % 4)
+        offsets.append(len(glyf))
+
+        head = bytearray(self.table(b"head"))
+        head[8:12] = b"\0\0\0\0"  # checkSumAdjustment, patched below
+        head[50:52] = struct.pack(">h", 1)  # long loca offsets
+
+        tables = {tag: self.table(tag) for tag in self.SUBSET_TABLES if tag in self.tables}
+        tables[b"head"] = bytes(head)
+        tables[b"glyf"] = bytes(glyf)
+        tables[b"loca"] = struct.pack(f">{len(offsets)}I", *offsets)
+        return _build_sfnt(tables)
+
+
+def _table_checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _build_sfnt(tables):
+    tags = sorted(tables)
+    num_tables = len(tags)
+    entry_selector = max(num_tables.bit_length() - 1, 0)
+    search_range = (1 << entry_selector) * 16
+    header = struct.pack(">IHHHH", 0x00010000, num_tables, search_range, entry_selector,
+                         num_tables * 16 - search_range)
+
+    directory = b""
+    body = b""
+    offset = 12 + 16 * num_tables
+    head_offset = 0
+    for tag in tags:
+        data = tables[tag]
+        if tag == b"head":
+            head_offset = offset
+        directory += struct.pack(">4sIII", tag, _table_checksum(data), offset, len(data))
+        padded = data + b"\0" * (-len(data) % 4)
+        body += padded
+        offset += len(padded)
+
+    font = bytearray(header + directory + body)
+    adjustment = (0xB1B0AFBA - _table_checksum(bytes(font))) & 0xFFFFFFFF
+    font[head_offset + 8:head_offset + 12] = struct.pack(">I", adjustment)
+    return bytes(font)
+
+
+class FontSubset:
+    """
+    Collects the glyphs used from one TrueType font while pages are written,
+    then embeds the subset as a Type0 font.
+
+    :param font: TrueTypeFont to draw text with.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.glyphs = {}  # glyph id -> text it was used for
+
+    def encode(self, text):
+        """Return the hex string operand that shows ``text`` with this font."""
+        codes = []
+        for char in text:
+            gid = self.font.glyph_id(char)
+            self.glyphs.setdefault(gid, char)
+            codes.append(gid)
+        return b"<" + b"".join(b"%04X" % gid for gid in codes) + b">"
+
+    def update(self, glyphs):
+        for gid, char in glyphs.items():
+            self.glyphs.setdefault(gid, char)
+
+    def _scale(self, value):
+        return round(value * 1000 / self.font.units_per_em)
+
+    def _widths(self):
+        widths = []
+        run_start, run = None, []
+        for gid in sorted(self.glyphs):
+            if run and gid == run_start + len(run):
+                run.append(self._scale(self.font.advances[gid]))
+                continue
+            if run:
+                widths += [run_start, run]
+            run_start, run = gid, [self._scale(self.font.advances[gid])]
+        if run:
+            widths += [run_start, run]
+        return widths
+
+    def _to_unicode(self):
+        entries = [(gid, char) for gid, char in sorted(self.glyphs.items()) if gid]
+        lines = [
+            b"/CIDInit /ProcSet findresource begin",
+            b"12 dict begin",
+            b"begincmap",
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            b"/CMapName /Adobe-Identity-UCS def",
+            b"/CMapType 2 def",
+            b"1 begincodespacerange",
+            b"<0000> <FFFF>",
+            b"endcodespacerange",
+        ]
+        for start in range(0, len(entries), 100):
+            chunk = entries[start:start + 100]
+            lines.append(b"%d beginbfchar" % len(chunk))
+            for gid, char in chunk:
+                lines.append(b"<%04X> <%s>" % (gid, char.encode("utf-16-be").hex().upper().encode("ascii")))
+            lines.append(b"endbfchar")
+        lines += [
+            b"endcmap",
+            b"CMapName currentdict /CMap defineresource pop",
+            b"end",
+            b"end",
+        ]
+        return b"\n".join(lines)
+
+    def write(self, writer, ref):
+        """Write the Type0 font and its descendants into the reserved ``ref``."""
+        font = self.font
+        # Subset tag is derived from the glyph set so output stays deterministic
+        digest = hashlib.sha1(repr(sorted(self.glyphs)).encode("ascii")).digest()
+        tag = "".join(chr(ord("A") + byte % 26) for byte in digest[:6])
+        base_font = Name(f"{tag}+{font.postscript_name}")
+
+        font_program = font.subset(self.glyphs)
+        font_file_ref = writer.add_stream({"Length1": len(font_program)}, font_program, compress=True)
+
+        flags = 32 | (64 if font.italic_angle else 0)
+        descriptor_ref = writer.add({
+            "Type": Name("FontDescriptor"),
+            "FontName": base_font,
+            "Flags": flags,
+            "FontBBox": [self._scale(value) for value in font.bbox],
+            "ItalicAngle": font.italic_angle,
+            "Ascent": self._scale(font.ascender),
+            "Descent": self._scale(font.descender),
+            "CapHeight": self._scale(font.cap_height),
+            "StemV": 120 if font.weight >= 600 else 80,
+            "FontFile2": font_file_ref,
+        })
+        descendant_ref = writer.add({
+            "Type": Name("Font"),
+            "Subtype": Name("CIDFontType2"),
+            "BaseFont": base_font,
+            "CIDSystemInfo": {"Registry": "Adobe", "Ordering": "Identity", "Supplement": 0},
+            "FontDescriptor": descriptor_ref,
+            "DW": 1000,
+            "W": self._widths(),
+            "CIDToGIDMap": Name("Identity"),
+        })
+        to_unicode_ref = writer.add_stream({}, self._to_unicode(), compress=True)
+        writer.add({
+            "Type": Name("Font"),
+            "Subtype": Name("Type0"),
+            "BaseFont": base_font,
+            "Encoding": Name("Identity-H"),
+            "DescendantFonts": [descendant_ref],
+            "ToUnicode": to_unicode_ref,
+        }, ref=ref)
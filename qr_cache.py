@@ -0,0 +1,169 @@
+"""
+Cache for generated QR codes.
+
+Every label of an order shares the same QR URL, so encoding the URL and
+scaling the image is done once per (url, size, error correction) key. Entries
+are kept in an in-memory LRU and, when a cache directory is configured, in an
+on-disk store that survives restarts and is shared by render worker processes.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+
+DEFAULT_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_M  # qrcode.QRCode() default
+
+
+def build_qr_code(url, error_correction=DEFAULT_ERROR_CORRECTION):
+    """ Build the QR code for a URL with the default qrcode sizing. """
+    qr = qrcode.QRCode(error_correction=error_correction)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def build_qr_image(url, size, error_correction=DEFAULT_ERROR_CORRECTION):
+    """ Generate the RGB QR code image pasted onto raster labels. """
+    qr_img = build_qr_code(url, error_correction).make_image(fill_color="black", back_color="white").convert("RGB")
+    return qr_img.resize((size, size))
+
+
+def build_qr_matrix(url, error_correction=DEFAULT_ERROR_CORRECTION):
+    """ Return the QR modules (including the quiet-zone border) as a tuple of rows of booleans. """
+    return tuple(tuple(bool(module) for module in row)
+                 for row in build_qr_code(url, error_correction).get_matrix())
+
+
+class QRCache:
+    """
+    LRU cache of QR code images and module matrices with hit/miss counters.
+
+    :param max_entries: Number of entries kept in memory.
+    :param cache_dir: Optional directory for the persistent store; None keeps the cache in memory only.
+    """
+
+    def __init__(self, max_entries=128, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key, extension):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{extension}")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        return None
+
+    def _write_disk(self, path, data):
+        # Write to a temp file and rename so concurrent workers never read half a file
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get_image(self, url, size, error_correction=DEFAULT_ERROR_CORRECTION):
+        """ Return the QR code image for ``url`` scaled to ``size`` pixels. Callers must not modify it. """
+        key = ("image", url, size, error_correction)
+        image = self._lookup(key)
+        if image is not None:
+            return image
+
+        path = self._disk_path(key, "png") if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with Image.open(path) as stored:
+                    image = stored.convert("RGB")
+                self.disk_hits += 1
+            except OSError:
+                image = None
+
+        if image is None:
+            self.misses += 1
+            image = build_qr_image(url, size, error_correction)
+            if path:
+                buffer = BytesIO()
+                image.save(buffer, "PNG")
+                self._write_disk(path, buffer.getvalue())
+
+        self._remember(key, image)
+        return image
+
+    def get_matrix(self, url, error_correction=DEFAULT_ERROR_CORRECTION):
+        """ Return the QR module matrix for ``url``, used by the vector backend. """
+        key = ("matrix", url, error_correction)
+        matrix = self._lookup(key)
+        if matrix is not None:
+            return matrix
+
+        path = self._disk_path(key, "txt") if self.cache_dir else None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="ascii") as stored:
+                rows = stored.read().split()
+            if rows:
+                matrix = tuple(tuple(char == "1" for char in row) for row in rows)
+                self.disk_hits += 1
+
+        if matrix is None:
+            self.misses += 1
+            matrix = build_qr_matrix(url, error_correction)
+            if path:
+                text = "\n".join("".join("1" if module else "0" for module in row) for row in matrix)
+                self._write_disk(path, text.encode("ascii"))
+
+        self._remember(key, matrix)
+        return matrix
+
+    def stats(self):
+        """ Return the memory hit, disk hit and miss (QR code actually encoded) counters. """
+        with self._lock:
+            entries = len(self._entries)
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": entries}
+
+    def clear(self):
+        """ Drop the in-memory entries and reset the counters (the disk store is kept). """
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+
+# Process-wide cache used by the label renderer
+default_cache = QRCache()
+
+
+def configure_default_cache(cache_dir=None, max_entries=128):
+    """ Replace the process-wide cache, e.g. to enable the persistent store. """
+    global default_cache
+    if default_cache.cache_dir != cache_dir or default_cache.max_entries != max_entries:
+        default_cache = QRCache(max_entries=max_entries, cache_dir=cache_dir)
+    return default_cache
+
+
+def get_default_cache():
+    return default_cache
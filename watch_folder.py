@@ -0,0 +1,202 @@
+"""
+Watch a folder for new chip files.
+
+File system events come from watchdog (inotify on Linux, ReadDirectoryChangesW
+on Windows) when it is installed, otherwise the folder is polled. Either way
+a new file is only handed on once its size and modification time have stopped
+changing for ``settle_seconds``, so files still being copied are not parsed
+half-written. Files that settle together are delivered as one batch, and
+``on_quiet`` is called once no new file has arrived for ``quiet_seconds``.
+
+Callbacks run on the watcher's thread; GUI callers must hand the work over to
+the Tk main loop themselves.
+"""
+import fnmatch
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventForwarder(FileSystemEventHandler):
+    """ Forwards created, modified and moved-in file paths to the watcher's queue. """
+
+    def __init__(self, events):
+        self._events = events
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._events.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._events.put(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._events.put(event.dest_path)
+
+
+class FolderWatcher:
+    """
+    Delivers chip files dropped into a folder in debounced batches.
+
+    :param folder: Folder to watch.
+    :param on_files: Called with a list of paths whose copy has finished.
+    :param on_quiet: Optional; called once after files were delivered and none arrived for ``quiet_seconds``,
+                     and again after each further quiet period while it returns False.
+    :param pattern: fnmatch pattern (case-insensitive) of the file names to pick up.
+    :param settle_seconds: How long a file's size and mtime must stay unchanged before it is delivered.
+    :param quiet_seconds: Idle time after the last delivered file before ``on_quiet`` is called.
+    :param poll_interval: Seconds between folder scans when polling.
+    :param use_polling: Poll even if watchdog is installed (e.g. for network drives that send no events).
+    :param include_existing: Also deliver the files already in the folder when watching starts.
+    """
+
+    def __init__(self, folder, on_files, on_quiet=None, pattern="*.bin", settle_seconds=1.0,
+                 quiet_seconds=10.0, poll_interval=1.0, use_polling=False, include_existing=False):
+        self.folder = os.path.abspath(folder)
+        self.on_files = on_files
+        self.on_quiet = on_quiet
+        self.pattern = pattern.lower()
+        self.settle_seconds = settle_seconds
+        self.quiet_seconds = quiet_seconds
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling or Observer is None
+        self.include_existing = include_existing
+
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        # path -> (size, mtime_ns, time the pair was last seen to change) for files still settling
+        self._pending = {}
+        # path -> (size, mtime_ns) of files already delivered, so a rewrite is picked up again
+        self._delivered = {}
+        self._last_delivery = None
+
+    @property
+    def mode(self):
+        return "polling" if self.use_polling else "events"
+
+    def _matches(self, path):
+        return fnmatch.fnmatch(os.path.basename(path).lower(), self.pattern)
+
+    def _scan(self):
+        """ Return {path: (size, mtime_ns)} of the matching files in the folder. """
+        files = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._matches(entry.name):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logging.error(f"Failed to scan watch folder '{self.folder}': {str(e)}")
+        return files
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not os.path.isdir(self.folder):
+            raise FileNotFoundError(f"Watch folder not found: {self.folder}")
+
+        existing = self._scan()
+        if self.include_existing:
+            for path in existing:
+                self._events.put(path)
+        else:
+            self._delivered.update(existing)
+
+        if not self.use_polling:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_EventForwarder(self._events), self.folder, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                logging.warning(f"File system events unavailable for '{self.folder}', polling instead: {str(e)}")
+                self._observer = None
+                self.use_polling = True
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="FolderWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _note_change(self, path, signature, now):
+        if self._delivered.get(path) == signature:
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[:2] != signature:
+            self._pending[path] = (signature[0], signature[1], now)
+
+    def _run(self):
+        tick = min(self.poll_interval, max(self.settle_seconds / 4, 0.05))
+        next_scan = 0.0
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            try:
+                self._step(now, now >= next_scan)
+            except Exception as e:
+                # A failing callback must not stop the watcher
+                logging.error(f"Watch folder error: {str(e)}")
+            if self.use_polling and now >= next_scan:
+                next_scan = now + self.poll_interval
+
+    def _step(self, now, scan_due):
+        if self.use_polling and scan_due:
+            for path, signature in self._scan().items():
+                self._note_change(path, signature, now)
+
+        # Queued paths from file system events are stat'ed to get their current signature
+        while True:
+            try:
+                path = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if path not in self._pending and self._matches(path):
+                self._pending[path] = (-1, -1, now)
+
+        ready = []
+        for path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Deleted or renamed away before it settled
+                del self._pending[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != (size, mtime_ns):
+                self._pending[path] = (signature[0], signature[1], now)
+            elif now - changed_at >= self.settle_seconds:
+                ready.append(path)
+                self._delivered[path] = signature
+                del self._pending[path]
+
+        if ready:
+            ready.sort()
+            self._last_delivery = now
+            self.on_files(ready)
+        elif (self._last_delivery is not None and not self._pending
+              and now - self._last_delivery >= self.quiet_seconds):
+            self._last_delivery = None
+            if self.on_quiet is not None and self.on_quiet() is False:
+                # The batch was not finished; call on_quiet again after another quiet period
+                self._last_delivery = now